@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +45,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'main',
     'rest_framework',
     'rest_framework.authtoken',
@@ -51,6 +54,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.PerformanceMiddleware',
+    'main.middleware.CompressionMiddleware',
+    'main.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,12 +65,95 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Responses of at least COMPRESSION_MIN_SIZE bytes are sent with brotli (when the brotli
+# package is installed) or gzip, whichever the client accepts. See main.middleware.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CONTENT_TYPES = ('application/json', 'application/msgpack', 'text/')
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+
+# orjson speeds up JSON encoding when installed and falls back to the json module otherwise.
+# MessagePack (Accept: application/msgpack) is offered only when msgpack is installed.
+MSGPACK_INSTALLED = find_spec('msgpack') is not None
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'main.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        *(['main.renderers.MessagePackRenderer'] if MSGPACK_INSTALLED else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'main.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        *(['main.renderers.MessagePackParser'] if MSGPACK_INSTALLED else []),
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-    ]
+        'main.authentication.CachedTokenAuthentication',
+        'main.authentication.SignedTokenAuthentication',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'main.throttling.UserThrottle',
+        'main.throttling.IPThrottle',
+    ],
+    # Token buckets: the rate is also the burst size, tokens refill evenly over the period.
+    # 'auth' limits the token endpoints per address, 'bulk' the bulk endpoint per user.
+    'DEFAULT_THROTTLE_RATES': {
+        'user': '1200/min',
+        'ip': '3000/min',
+        'auth': '20/min',
+        'bulk': '60/min',
+    },
 }
 
+# Token lookups are cached in AUTH_CACHE_ALIAS, shared by all workers when Redis is
+# configured, so a deleted token stops working everywhere at once. See main.authentication.
+AUTH_CACHE_ALIAS = 'tasks'
+AUTH_CACHE_TTL = 60
+SIGNED_TOKEN_MAX_AGE = 7 * 24 * 60 * 60
+
+# Cursor pagination of task lists, see main.pagination.TaskCursorPagination
+TASK_PAGE_SIZE = 100
+TASK_MAX_PAGE_SIZE = 1000
+
+# Bulk task endpoints, see main.views.TaskViewSet.bulk
+TASK_BULK_MAX_ITEMS = 10000
+TASK_BULK_BATCH_SIZE = 1000
+
+# Delta sync, see main.views.SyncView. Rows newer than this many seconds are left
+# for the next sync so that transactions still committing are not skipped.
+TASK_SYNC_DELAY = 2
+# Rows of each model per /api/sync/ page; the rest follows with ?cursor=
+TASK_SYNC_PAGE_SIZE = 1000
+
+# Rows fetched per round trip by the server-side cursor of /api/tasks/export/
+TASK_EXPORT_CHUNK_SIZE = 2000
+
+# /api/tasks/stats/ counts tasks directly by default. With True it reads the
+# trigger-maintained main_taskstatssummary table instead,
+# see "python manage.py task_stats_summary enable".
+TASK_STATS_SUMMARY = False
+TASK_STATS_MAX_DAYS = 366
+
+# /api/tasks/search/ returns at most this many tasks, ?limit= can lower it
+TASK_SEARCH_MAX_RESULTS = 100
+
+# Default age in days of the rows moved by "python manage.py archive_tasks". Sync tokens
+# older than TASK_ARCHIVE_DELETED_DAYS are rejected: deletions before it may be archived.
+TASK_ARCHIVE_DELETED_DAYS = 30
+TASK_ARCHIVE_COMPLETED_DAYS = 365
+
+# Background jobs, see main.jobs and "python manage.py run_jobs". A running job that
+# has not reported progress for TASK_JOB_TIMEOUT seconds is picked up by another worker.
+TASK_JOB_TIMEOUT = 3600
+TASK_JOB_POLL_INTERVAL = 1
+
+# Request metrics, see main.middleware.PerformanceMiddleware. Requests slower than
+# PERFORMANCE_SLOW_REQUEST_MS are logged to "main.performance" with their SQL.
+PERFORMANCE_SLOW_REQUEST_MS = 500
+PERFORMANCE_SLOW_LOG_QUERIES = 50
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
 ROOT_URLCONF = 'To_Do_List.urls'
 
 TEMPLATES = [
@@ -100,6 +189,59 @@ DATABASES = {
     }
 }
 
+# Read replicas: aliases from DATABASES that serve GET requests, see main.routers.
+# A client reads from the primary for REPLICA_PIN_SECONDS after its own write, and a
+# replica more than REPLICA_MAX_LAG seconds behind is skipped until it catches up.
+DATABASE_ROUTERS = ['main.routers.ReplicaRouter']
+REPLICA_DATABASES = []
+REPLICA_PIN_SECONDS = 5
+REPLICA_MAX_LAG = 2
+REPLICA_LAG_CHECK_INTERVAL = 5
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Task list responses are cached per user in the 'tasks' cache, see main.cache.
+# Set REDIS_URL to share it between processes; Redis bounds its size with maxmemory.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'tasks': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'TIMEOUT': 300,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tasks',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+TASK_CACHE_ALIAS = 'tasks'
+
+# Throttle buckets live in each process ('local') or in THROTTLE_CACHE_ALIAS ('cache'),
+# which every worker shares when Redis is configured. See main.throttling.
+THROTTLE_BACKEND = 'cache' if REDIS_URL else 'local'
+THROTTLE_CACHE_ALIAS = 'tasks'
+THROTTLE_LOCAL_MAX_KEYS = 100000
+
+# Change feed at /api/events/, see main.events. 'local' delivers events to clients connected to
+# the same process; 'postgres' fans them out to every worker through LISTEN/NOTIFY.
+EVENTS_BACKEND = 'local'
+EVENTS_KEEPALIVE = 25
+EVENTS_RETRY_MS = 3000
+EVENTS_QUEUE_SIZE = 1000
+EVENTS_REPLAY_LIMIT = 1000
+EVENTS_IDS_PER_EVENT = 500
+EVENTS_RECONNECT_DELAY = 1
+
+# Tasks a user may own, including soft-deleted ones not archived yet; None disables the quota.
+TASK_QUOTA_PER_USER = 100000
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -136,6 +278,9 @@ USE_TZ = True
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Files produced by background jobs
+MEDIA_ROOT = BASE_DIR / "media"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,95 @@
+"""
+Production settings for To_Do_List project.
+
+Everything that differs between deployments is read from the environment.
+Start the server with runserver-production.sh, which selects this module.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def env_bool(name, default=False):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+DEBUG = env_bool('DJANGO_DEBUG')
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', '*').split(',')
+
+
+# Database
+# https://docs.djangoproject.com/en/5.1/ref/databases/#postgresql-notes
+#
+# DB_POOL=1 uses the psycopg 3 connection pool of Django 5.1: every worker process keeps
+# DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE open connections and hands them to requests.
+# Without it connections are kept open for DB_CONN_MAX_AGE seconds and checked with
+# a ping before reuse. Either way a request no longer pays for a new Postgres connection.
+
+DATABASES['default'].update({
+    'NAME': os.environ.get('DB_NAME', DATABASES['default']['NAME']),
+    'USER': os.environ.get('DB_USER', DATABASES['default']['USER']),
+    'PASSWORD': os.environ.get('DB_PASSWORD', DATABASES['default']['PASSWORD']),
+    'HOST': os.environ.get('DB_HOST', DATABASES['default']['HOST']),
+    'PORT': os.environ.get('DB_PORT', DATABASES['default']['PORT']),
+    'CONN_MAX_AGE': env_int('DB_CONN_MAX_AGE', 60),
+    'CONN_HEALTH_CHECKS': env_bool('DB_CONN_HEALTH_CHECKS', True),
+    'DISABLE_SERVER_SIDE_CURSORS': env_bool('DB_DISABLE_SERVER_SIDE_CURSORS'),
+    'OPTIONS': {
+        'connect_timeout': env_int('DB_CONNECT_TIMEOUT', 5),
+        'options': f"-c statement_timeout={env_int('DB_STATEMENT_TIMEOUT_MS', 30000)}",
+    },
+})
+
+if env_bool('DB_POOL'):
+    # CONN_HEALTH_CHECKS makes Django pass ConnectionPool.check_connection to the pool.
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': env_int('DB_POOL_MIN_SIZE', 2),
+        'max_size': env_int('DB_POOL_MAX_SIZE', 10),
+        'timeout': env_int('DB_POOL_TIMEOUT', 10),
+        'max_idle': env_int('DB_POOL_MAX_IDLE', 600),
+    }
+
+# DB_REPLICA_HOSTS=replica1,replica2 adds read replicas with the same credentials as the primary
+for number, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'OPTIONS': {**DATABASES['default']['OPTIONS']},
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{number}')
+REPLICA_PIN_SECONDS = env_int('DB_REPLICA_PIN_SECONDS', REPLICA_PIN_SECONDS)
+REPLICA_MAX_LAG = env_int('DB_REPLICA_MAX_LAG', REPLICA_MAX_LAG)
+
+# Cache
+#
+# Every gunicorn worker is a separate process. Without a shared 'tasks' cache a version bump
+# in one worker would leave stale responses and ETags in the others, and the replica pin
+# after a write would only hold in the worker that handled it.
+
+if not REDIS_URL:
+    raise ImproperlyConfigured('REDIS_URL must be set: production workers share the tasks cache through Redis.')
+
+# Prometheus scrapes /metrics from these addresses, e.g. METRICS_ALLOWED_IPS=10.0.0.5,10.0.0.6
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', ','.join(METRICS_ALLOWED_IPS)).split(',')
+PERFORMANCE_SLOW_REQUEST_MS = env_int('PERFORMANCE_SLOW_REQUEST_MS', PERFORMANCE_SLOW_REQUEST_MS)
+
+# Throttle rates, e.g. THROTTLE_RATE_USER=600/min; TASK_QUOTA_PER_USER=0 disables the task quota
+for scope in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']:
+    REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope] = os.environ.get(
+        f'THROTTLE_RATE_{scope.upper()}', REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope])
+TASK_QUOTA_PER_USER = env_int('TASK_QUOTA_PER_USER', TASK_QUOTA_PER_USER or 0) or None
+
+# Every gunicorn worker keeps one LISTEN connection for the change feed
+EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND', 'postgres')
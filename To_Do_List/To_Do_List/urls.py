@@ -21,6 +21,8 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
+from main.metrics import metrics_view
+
 schema_view = get_schema_view(
     openapi.Info(
         title="TODO list API",
@@ -34,6 +36,7 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('main.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('docs/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('', RedirectView.as_view(url='/api/', permanent=True)),
 ]
@@ -0,0 +1,146 @@
+import math
+from datetime import datetime
+from functools import wraps
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.http import JsonResponse, Http404, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import events, throttling
+from .models import Task
+from .serializers import TaskSerializer
+
+
+async def authenticate(request):
+    # те же классы, что и у DRF (Token и Signed), через их асинхронные варианты
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        authenticator = authentication_class()
+        if keyword == authenticator.keyword and key:
+            try:
+                user, _ = await authenticator.aauthenticate_credentials(key)
+            except AuthenticationFailed:
+                return None
+            return user
+    return None
+
+
+def async_api_view(view):
+    @require_GET
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await authenticate(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        request.user = user
+        waits = [throttle.wait() for throttle in (throttling.UserThrottle(), throttling.IPThrottle())
+                 if not await throttle.aallow_request(request, None)]
+        if waits:
+            response = JsonResponse({'detail': 'Request was throttled.'}, status=429)
+            response['Retry-After'] = str(math.ceil(max(waits)))
+            return response
+        try:
+            return await view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'detail': 'Not found.'}, status=404)
+        except ValidationError as error:
+            return JsonResponse(error.detail, status=400)
+    return wrapper
+
+
+def get_visible_tasks(request):
+    queryset = Task.objects.all()
+    if not request.user.is_staff:
+        queryset = queryset.filter(deleted=False, owner=request.user)
+    expanded = TaskSerializer.get_expanded_fields(Request(request))
+    return queryset.select_related(*expanded) if expanded else queryset
+
+
+def get_serializer(request):
+    return TaskSerializer(context={'request': Request(request)})
+
+
+def get_page_size(request):
+    try:
+        page_size = int(request.GET['page_size'])
+    except (KeyError, ValueError):
+        return settings.TASK_PAGE_SIZE
+    return min(page_size, settings.TASK_MAX_PAGE_SIZE) if page_size > 0 else settings.TASK_PAGE_SIZE
+
+
+async def paginated_response(request, queryset):
+    page_size = get_page_size(request)
+    after = request.GET.get('after')
+    if after:
+        try:
+            created_at, pk = signing.loads(after, salt='main.async_views')
+            created_at = datetime.fromisoformat(created_at)
+        except (signing.BadSignature, TypeError, ValueError):
+            return JsonResponse({'detail': 'Invalid cursor.'}, status=404)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+
+    serializer = get_serializer(request)
+    tasks = [task async for task in queryset.order_by('-created_at', '-id')[:page_size + 1].aiterator()]
+    next_url = None
+    if len(tasks) > page_size:
+        tasks = tasks[:page_size]
+        query = request.GET.copy()
+        query['after'] = signing.dumps((tasks[-1].created_at.isoformat(), tasks[-1].pk), salt='main.async_views')
+        next_url = request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+    return JsonResponse({
+        'next': next_url,
+        'results': [serializer.to_representation(task) for task in tasks],
+    })
+
+
+@async_api_view
+async def task_list(request):
+    return await paginated_response(request, get_visible_tasks(request))
+
+
+@async_api_view
+async def task_detail(request, pk):
+    try:
+        task = await get_visible_tasks(request).aget(pk=pk)
+    except Task.DoesNotExist:
+        raise Http404
+    return JsonResponse(get_serializer(request).to_representation(task))
+
+
+@async_api_view
+async def tasks_by_status(request, status):
+    return await paginated_response(request, get_visible_tasks(request).filter(status=status))
+
+
+@async_api_view
+async def tasks_by_category(request, category):
+    return await paginated_response(request, get_visible_tasks(request).filter(category=category))
+
+
+@async_api_view
+async def tasks_by_priority(request, priority):
+    return await paginated_response(request, get_visible_tasks(request).filter(priority=priority))
+
+
+@async_api_view
+async def event_stream(request):
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    if since:
+        try:
+            since = events.load_token(since)
+        except signing.SignatureExpired:
+            return JsonResponse({'since': 'Event id expired, sync again without it.'}, status=400)
+        except (signing.BadSignature, TypeError, ValueError):
+            return JsonResponse({'since': 'Invalid event id.'}, status=400)
+
+    response = StreamingHttpResponse(events.stream(request.user, since or None), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx иначе буферизует поток
+    response['X-Accel-Buffering'] = 'no'
+    return response
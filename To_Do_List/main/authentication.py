@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    # Записи лежат в общем кеше AUTH_CACHE_ALIAS (Redis в production): удаление токена или
+    # изменение пользователя сразу действует во всех воркерах, а не через AUTH_CACHE_TTL.
+    @staticmethod
+    def get_cache():
+        return caches[settings.AUTH_CACHE_ALIAS]
+
+    @staticmethod
+    def make_key(key):
+        # подписанные токены хранятся под ключом ('user', id)
+        return f'auth:user:{key[1]}' if isinstance(key, tuple) else f'auth:token:{key}'
+
+    def get(self, key):
+        return self.get_cache().get(self.make_key(key))
+
+    def set(self, key, value):
+        self.get_cache().set(self.make_key(key), value, timeout=settings.AUTH_CACHE_TTL)
+
+    async def aget(self, key):
+        return await self.get_cache().aget(self.make_key(key))
+
+    async def aset(self, key, value):
+        await self.get_cache().aset(self.make_key(key), value, timeout=settings.AUTH_CACHE_TTL)
+
+    def pop(self, key):
+        self.get_cache().delete(self.make_key(key))
+
+    def pop_user(self, user_id):
+        keys = [('user', user_id), *Token.objects.filter(user_id=user_id).values_list('key', flat=True)]
+        self.get_cache().delete_many([self.make_key(key) for key in keys])
+
+
+# ключ токена -> (пользователь, токен)
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(key, credentials)
+        return credentials
+
+    async def aauthenticate_credentials(self, key):
+        credentials = await token_cache.aget(key)
+        if credentials is None:
+            try:
+                token = await Token.objects.select_related('user').aget(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            credentials = (token.user, token)
+            await token_cache.aset(key, credentials)
+        return credentials
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    keyword = 'Signed'
+    salt = 'main.authentication'
+
+    @classmethod
+    def create_token(cls, user):
+        return signing.dumps([user.pk, user.get_session_auth_hash()], salt=cls.salt)
+
+    def load_key(self, key):
+        try:
+            return signing.loads(key, salt=self.salt, max_age=settings.SIGNED_TOKEN_MAX_AGE)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+    @staticmethod
+    def check(credentials, auth_hash, key):
+        user = credentials[0]
+        # смена пароля меняет хеш и тем самым отзывает все подписанные токены пользователя.
+        if user is None or user.get_session_auth_hash() != auth_hash:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        return user, key
+
+    def authenticate_credentials(self, key):
+        user_id, auth_hash = self.load_key(key)
+        credentials = token_cache.get(('user', user_id))
+        if credentials is None:
+            user = User.objects.filter(pk=user_id, is_active=True).first()
+            credentials = (user, None)
+            if user is not None:
+                token_cache.set(('user', user_id), credentials)
+        return self.check(credentials, auth_hash, key)
+
+    async def aauthenticate_credentials(self, key):
+        user_id, auth_hash = self.load_key(key)
+        credentials = await token_cache.aget(('user', user_id))
+        if credentials is None:
+            user = await User.objects.filter(pk=user_id, is_active=True).afirst()
+            credentials = (user, None)
+            if user is not None:
+                await token_cache.aset(('user', user_id), credentials)
+        return self.check(credentials, auth_hash, key)
@@ -0,0 +1,115 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import cache
+from .models import Task, Category, Priority
+
+WORDS = ('report', 'invoice', 'meeting', 'release', 'backup', 'review', 'design', 'budget', 'client', 'server',
+         'deploy', 'email', 'call', 'draft', 'plan', 'order', 'travel', 'groceries', 'doctor', 'payment')
+STATUSES = ('Pending', 'In Progress', 'Done')
+
+
+def seed(users, categories, priorities, tasks, seed=0, batch_size=5000):
+    # одинаковый seed дает одинаковые данные, поэтому результаты разных запусков сравнимы
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    owners = User.objects.bulk_create(
+        [User(username=f'bench{index}', password='!') for index in range(users)], batch_size=batch_size)
+    Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in owners], batch_size=batch_size)
+    user_categories = Category.objects.bulk_create(
+        [Category(name=f'category {index}', owner=user, created_by=user.username)
+         for user in owners for index in range(categories)], batch_size=batch_size)
+    user_priorities = Priority.objects.bulk_create(
+        [Priority(name=f'priority {index}', owner=user, created_by=user.username)
+         for user in owners for index in range(priorities)], batch_size=batch_size)
+
+    for number, user in enumerate(owners):
+        own_categories = user_categories[number * categories:(number + 1) * categories]
+        own_priorities = user_priorities[number * priorities:(number + 1) * priorities]
+        rows = []
+        for _ in range(tasks):
+            status = rng.choice(STATUSES)
+            rows.append(Task(
+                owner=user,
+                created_by=user.username,
+                title=' '.join(rng.sample(WORDS, 3)),
+                description=' '.join(rng.choices(WORDS, k=rng.randint(5, 60))),
+                status=status,
+                completed=status == 'Done',
+                completed_at=now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)) if status == 'Done' else None,
+                deleted=rng.random() < 0.05,
+                category=rng.choice(own_categories),
+                priority=rng.choice(own_priorities),
+            ))
+        Task.objects.bulk_create(rows, batch_size=batch_size)
+    return owners
+
+
+def get_endpoints(user):
+    task = Task.objects.filter(owner=user, deleted=False).order_by('id').first()
+    return {
+        'task-list': '/api/tasks/',
+        'task-list-expand': '/api/tasks/?expand=category,priority',
+        'task-list-fields': '/api/tasks/?fields=id,title,status',
+        'task-list-filter': f'/api/tasks/?status=Pending&priority={task.priority_id}&ordering=priority',
+        'task-status': '/api/tasks/status/Pending/',
+        'task-category': f'/api/tasks/category/{task.category_id}/',
+        'task-priority': f'/api/tasks/priority/{task.priority_id}/',
+        'task-detail': f'/api/tasks/{task.pk}/',
+        'task-search': '/api/tasks/search/?q=invoice',
+        'task-stats': '/api/tasks/stats/',
+        'category-list': '/api/categories/',
+        'priority-list': '/api/priorities/',
+        'sync': '/api/sync/',
+        'async-task-list': '/api/async/tasks/',
+    }
+
+
+def measure(client, user, url, requests, cached=False):
+    # каждый запрос тестового клиента очищает журнал запросов, поэтому он очищается и перед замером,
+    # а число запросов берется сразу после него
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        status = client.get(url).status_code
+    query_count = len(queries)
+
+    timings = []
+    for _ in range(requests):
+        if not cached:
+            # новая версия кеша - каждый запрос идет в базу, а не в кеш ответов
+            cache.bump(user.pk)
+        started = time.perf_counter()
+        client.get(url)
+        timings.append(time.perf_counter() - started)
+
+    percentiles = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'status': status,
+        'queries': query_count,
+        'p50_ms': round(statistics.median(timings) * 1000, 3),
+        'p99_ms': round(percentiles[98] * 1000, 3),
+        'rps': round(len(timings) / sum(timings), 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for size, endpoints in results.items():
+        for name, result in endpoints.items():
+            previous = baseline.get(size, {}).get(name)
+            if previous is None:
+                continue
+            if result['p50_ms'] > previous['p50_ms'] * (1 + threshold):
+                regressions.append(f'{size} tasks, {name}: p50 {previous["p50_ms"]} -> {result["p50_ms"]} ms')
+            if result['queries'] > previous['queries']:
+                regressions.append(f'{size} tasks, {name}: queries {previous["queries"]} -> {result["queries"]}')
+    return regressions
@@ -0,0 +1,136 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache, events, throttling
+from .models import Task, Category, Priority
+from .serializers import BulkTaskSerializer
+
+
+def create_many(user, items):
+    context = get_bulk_context(user, items)
+    quota = throttling.get_quota_left(user)
+    detail = str(throttling.QuotaExceeded.default_detail)
+    results, tasks = [], []
+    for index, item in enumerate(items):
+        serializer = BulkTaskSerializer(data=item, context=context)
+        if quota is not None and len(tasks) >= quota:
+            results.append({'index': index, 'status': 403, 'errors': {'detail': detail}})
+        elif serializer.is_valid():
+            tasks.append(Task(**serializer.validated_data, created_by=user.username, owner=user))
+            results.append({'index': index, 'status': 201})
+        else:
+            results.append({'index': index, 'status': 400, 'errors': serializer.errors})
+
+    with transaction.atomic():
+        Task.objects.bulk_create(tasks, batch_size=settings.TASK_BULK_BATCH_SIZE)
+        if tasks:
+            events.publish_ids('created', [(task.pk, user.pk) for task in tasks])
+    cache.bump(user.pk)
+
+    created = iter(tasks)
+    for result in results:
+        if result['status'] == 201:
+            result['id'] = next(created).pk
+    return results
+
+
+def update_many(user, items):
+    context = get_bulk_context(user, items)
+    instances = Task.objects.in_bulk(get_bulk_ids(item.get('id') for item in items if isinstance(item, dict)))
+    now = timezone.now()
+    results, tasks, fields = [], {}, {'updated_at', 'completed_at'}
+    for index, item in enumerate(items):
+        task_id = item.get('id') if isinstance(item, dict) else None
+        instance = instances.get(to_id(task_id))
+        if instance is None or (not user.is_staff and instance.deleted):
+            results.append({'index': index, 'id': task_id, 'status': 404})
+            continue
+        if not user.is_staff and instance.owner_id != user.pk:
+            results.append({'index': index, 'id': task_id, 'status': 403})
+            continue
+
+        serializer = BulkTaskSerializer(instance, data=item, partial=True, context=context)
+        if not serializer.is_valid():
+            results.append({'index': index, 'id': task_id, 'status': 400, 'errors': serializer.errors})
+            continue
+        BulkTaskSerializer.set_completed_at(instance, serializer.validated_data)
+        for attr, value in serializer.validated_data.items():
+            setattr(instance, attr, value)
+        instance.updated_at = now
+        fields.update(serializer.validated_data)
+        tasks[instance.pk] = instance
+        results.append({'index': index, 'id': instance.pk, 'status': 200})
+
+    if tasks:
+        with transaction.atomic():
+            Task.objects.bulk_update(tasks.values(), sorted(fields), batch_size=settings.TASK_BULK_BATCH_SIZE)
+            events.publish_ids('updated', [(task.pk, task.owner_id) for task in tasks.values()])
+        cache.bump(*{task.owner_id for task in tasks.values()})
+    return results
+
+
+def destroy_many(user, items):
+    rows = {pk: (owner_id, deleted) for pk, owner_id, deleted in
+            Task.objects.filter(pk__in=get_bulk_ids(items)).values_list('pk', 'owner_id', 'deleted')}
+    results, hard_delete, soft_delete = [], [], []
+    for index, task_id in enumerate(items):
+        row = rows.get(to_id(task_id))
+        if row is None:
+            results.append({'index': index, 'id': task_id, 'status': 404})
+        elif user.is_staff:
+            hard_delete.append(to_id(task_id))
+            results.append({'index': index, 'id': task_id, 'status': 204})
+        elif row[1]:
+            results.append({'index': index, 'id': task_id, 'status': 204})
+        elif row[0] != user.pk:
+            results.append({'index': index, 'id': task_id, 'status': 403})
+        else:
+            soft_delete.append(to_id(task_id))
+            results.append({'index': index, 'id': task_id, 'status': 204})
+
+    now = timezone.now()
+    with transaction.atomic():
+        if hard_delete:
+            Task.objects.filter(pk__in=hard_delete).delete()
+        if soft_delete:
+            Task.objects.filter(pk__in=soft_delete).update(deleted=True, deleted_at=now, updated_at=now)
+            events.publish_ids('deleted', [(pk, user.pk) for pk in soft_delete])
+    # после фиксации, иначе параллельный запрос успеет закешировать старые строки под новой версией
+    if hard_delete or soft_delete:
+        cache.bump(*{rows[pk][0] for pk in hard_delete}, *({user.pk} if soft_delete else ()))
+    return results
+
+
+HANDLERS = {
+    'POST': create_many,
+    'PATCH': update_many,
+    'DELETE': destroy_many,
+}
+
+
+def get_bulk_context(user, items):
+    items = [item for item in items if isinstance(item, dict)]
+    categories = Category.objects.all()
+    priorities = Priority.objects.all()
+    if not user.is_staff:
+        categories = categories.filter(owner=user, deleted=False)
+        priorities = priorities.filter(owner=user, deleted=False)
+
+    return {
+        'prefetched': {
+            'category': categories.in_bulk(get_bulk_ids(item.get('category') for item in items)),
+            'priority': priorities.in_bulk(get_bulk_ids(item.get('priority') for item in items)),
+        },
+    }
+
+
+def get_bulk_ids(values):
+    return {pk for pk in map(to_id, values) if pk is not None}
+
+
+def to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,73 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+STAFF_SCOPE = 'all'
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[settings.TASK_CACHE_ALIAS]
+
+
+def get_scope(user):
+    return STAFF_SCOPE if user.is_staff else user.pk
+
+
+def get_version(scope):
+    cache = get_cache()
+    key = f'tasks:version:{scope}'
+    version = cache.get(key)
+    if version is None:
+        # после вытеснения ключа версия начинается с текущего времени,
+        # чтобы не совпасть со старыми закешированными ответами.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump(*owner_ids):
+    cache = get_cache()
+    keys = [f'tasks:version:{scope}' for scope in {*owner_ids, STAFF_SCOPE} if scope is not None]
+    versions = cache.get_many(keys)
+    # версия - время последнего изменения в наносекундах, она же служит Last-Modified.
+    now = time.time_ns()
+    cache.set_many({key: max(now, versions.get(key, 0) + 1) for key in keys}, timeout=None)
+
+
+def get_response_key(request):
+    scope = get_scope(request.user)
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'tasks:response:{scope}:{get_version(scope)}:{url}'
+
+
+def load(key):
+    data = get_cache().get(key)
+    stats.record(data is not None)
+    return data
+
+
+def store(key, data):
+    get_cache().set(key, data)
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import cache, events
+from .models import Task
+
+# Задачи категории или приоритета удаляются и помечаются одним запросом в базе, без загрузки
+# в Python и без сигналов. Поэтому кеш и поток событий обновляются здесь явно.
+DELETE_SQL = '''
+DELETE FROM {table} WHERE id IN (
+    SELECT id FROM {table} WHERE {column} = %(id)s LIMIT %(batch_size)s
+)
+RETURNING id, owner_id
+'''
+
+SOFT_DELETE_SQL = '''
+UPDATE {table} SET deleted = true, deleted_at = %(now)s, updated_at = %(now)s
+WHERE {column} = %(id)s AND NOT deleted
+RETURNING id, owner_id
+'''
+
+
+def get_sql(sql, instance):
+    quote = connection.ops.quote_name
+    return sql.format(table=quote(Task._meta.db_table), column=quote(f'{instance._meta.model_name}_id'))
+
+
+def count_tasks(instance):
+    return Task.objects.filter(**{instance._meta.model_name: instance}).aggregate(
+        tasks=Count('id'), live_tasks=Count('id', filter=Q(deleted=False)))
+
+
+def delete(instance, progress=None):
+    sql = get_sql(DELETE_SQL, instance)
+    params = {'id': instance.pk, 'batch_size': settings.TASK_BULK_BATCH_SIZE}
+    deleted, owners = 0, set()
+    while True:
+        # каждая пачка - отдельная короткая транзакция
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            events.publish_ids('deleted', rows)
+        deleted += len(rows)
+        owners.update(owner_id for _, owner_id in rows)
+        if progress is not None:
+            progress(deleted)
+        if len(rows) < params['batch_size']:
+            break
+
+    # задач уже нет, и удаление самой записи не собирает каскад
+    instance.delete()
+    cache.bump(*owners)
+    return deleted
+
+
+def soft_delete(instance):
+    now = timezone.now()
+    with transaction.atomic():
+        instance.deleted = True
+        instance.deleted_at = now
+        instance.save()
+        with connection.cursor() as cursor:
+            cursor.execute(get_sql(SOFT_DELETE_SQL, instance), {'id': instance.pk, 'now': now})
+            rows = cursor.fetchall()
+        events.publish_ids('deleted', rows)
+    cache.bump(*{owner_id for _, owner_id in rows})
+    return len(rows)
@@ -0,0 +1,58 @@
+import hashlib
+from functools import wraps
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from . import cache, routers
+
+
+def get_validators(request, instance=None):
+    scope = cache.get_scope(request.user)
+    version = cache.get_version(scope)
+    # JSON и MessagePack - разные представления одного ресурса
+    media_type = getattr(request, 'accepted_media_type', '')
+    key = f'{scope}:{version}:{media_type}:{request.get_full_path()}'
+    if instance is not None:
+        key = f'{key}:{instance.updated_at.isoformat()}'
+    digest = hashlib.md5(key.encode()).hexdigest()
+    return f'"{digest}"', version // 10 ** 9
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Authorization', 'Accept'))
+    return response
+
+
+def respond(request, etag, last_modified, get_response):
+    headers = set_validators(HttpResponse(), etag, last_modified)
+    response = get_conditional_response(request._request, etag=etag, last_modified=last_modified,
+                                        response=headers)
+    if response is not headers:
+        return response
+
+    response = get_response()
+    # ETag клиента выдан за чтение с основной базы, поэтому 304 выше верен и для реплики
+    if response.status_code == 200 and not routers.uses_replica():
+        set_validators(response, etag, last_modified)
+    return response
+
+
+# Для списков: коллекция есть всегда, и 304 можно ответить до запроса к базе.
+def conditional_get(view_method):
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        etag, last_modified = get_validators(request)
+        return respond(request, etag, last_modified, lambda: view_method(self, request, *args, **kwargs))
+    return wrapper
+
+
+# Для одного объекта: сначала get_object_or_404 и проверка владельца, иначе на чужую или
+# несуществующую запись с подходящим If-Modified-Since ушел бы 304 вместо 404.
+def object_response(request, instance, get_response):
+    etag, last_modified = get_validators(request, instance)
+    return respond(request, etag, last_modified, get_response)
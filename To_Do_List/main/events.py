@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import partial
+
+import psycopg
+from django.conf import settings
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .models import Task, Category, Priority, TaskArchive
+from .serializers import TaskSerializer, CategorySerializer, PrioritySerializer
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'main_events'
+STAFF_SCOPE = 'all'
+# NOTIFY принимает не больше 8000 байт, большие события уходят без данных
+NOTIFY_MAX_SIZE = 7900
+
+MODELS = {
+    'task': (Task, TaskSerializer),
+    'category': (Category, CategorySerializer),
+    'priority': (Priority, PrioritySerializer),
+}
+
+
+# id события совпадает с токеном /api/sync/, поэтому клиент может продолжить и через sync
+def make_token(moment):
+    return signing.dumps(moment.isoformat(), salt='main.sync')
+
+
+def load_token(token):
+    return datetime.fromisoformat(signing.loads(
+        token, salt='main.sync', max_age=timedelta(days=settings.TASK_ARCHIVE_DELETED_DAYS)))
+
+
+def make_event(name, instance, action, moment=None):
+    serializer_class = MODELS[name][1]
+    return {
+        'id': make_token(moment or instance.updated_at),
+        'event': name,
+        'owner': instance.owner_id,
+        'data': {'action': action, 'id': instance.pk, name: serializer_class(instance).data},
+    }
+
+
+def format_event(event):
+    lines = [f'event: {event["event"]}']
+    if event.get('id'):
+        lines.insert(0, f'id: {event["id"]}')
+    lines.append(f'data: {json.dumps(event["data"], cls=DjangoJSONEncoder)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class Broker:
+    def __init__(self):
+        # очередь -> (цикл событий подписчика, владелец или STAFF_SCOPE)
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user):
+        queue = asyncio.Queue()
+        scope = STAFF_SCOPE if user.is_staff else user.pk
+        with self._lock:
+            self._subscribers[queue] = (asyncio.get_running_loop(), scope)
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def publish(self, event):
+        # может вызываться из любого потока
+        with self._lock:
+            targets = [(queue, loop) for queue, (loop, scope) in self._subscribers.items()
+                       if scope == STAFF_SCOPE or scope == event['owner']]
+        for queue, loop in targets:
+            try:
+                loop.call_soon_threadsafe(self.put, queue, event)
+            except RuntimeError:
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def put(queue, event):
+        # медленный клиент получает None и отключается, а потом продолжает с Last-Event-ID
+        if queue.qsize() < settings.EVENTS_QUEUE_SIZE:
+            queue.put_nowait(event)
+        elif queue.qsize() == settings.EVENTS_QUEUE_SIZE:
+            queue.put_nowait(None)
+
+
+broker = Broker()
+
+
+class Listener:
+    # Одно соединение LISTEN на процесс пересылает события всех воркеров в локальный брокер.
+    def __init__(self):
+        self._task = None
+
+    def ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.listen())
+
+    async def listen(self):
+        params = connections['default'].get_connection_params()
+        for name in ('cursor_factory', 'context', 'pool'):
+            params.pop(name, None)
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(**params, autocommit=True) as conn:
+                    await conn.execute(f'LISTEN {CHANNEL}')
+                    async for notify in conn.notifies():
+                        broker.publish(json.loads(notify.payload))
+            except psycopg.Error:
+                # события, пропущенные за время переподключения, клиенты получат при следующем подключении
+                logger.exception('Event listener lost its connection')
+                await asyncio.sleep(settings.EVENTS_RECONNECT_DELAY)
+
+
+listener = Listener()
+
+
+def publish(event):
+    if settings.EVENTS_BACKEND == 'postgres':
+        # NOTIFY доставляется только после фиксации транзакции
+        payload = json.dumps(event, cls=DjangoJSONEncoder)
+        if len(payload.encode()) > NOTIFY_MAX_SIZE:
+            data = {key: value for key, value in event['data'].items() if key in ('action', 'id')}
+            payload = json.dumps({**event, 'data': data}, cls=DjangoJSONEncoder)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+    else:
+        transaction.on_commit(partial(broker.publish, event))
+
+
+def make_ids_events(action, rows):
+    ids = defaultdict(list)
+    for pk, owner_id in rows:
+        ids[owner_id].append(pk)
+    size = settings.EVENTS_IDS_PER_EVENT
+    return [{'id': None, 'event': 'task', 'owner': owner_id,
+             'data': {'action': action, 'ids': owner_ids[start:start + size]}}
+            for owner_id, owner_ids in ids.items() for start in range(0, len(owner_ids), size)]
+
+
+def publish_ids(action, rows):
+    # Пакетные изменения идут мимо сигналов. Событие несет id задач, и клиент забирает их через
+    # /api/tasks/?id__in=...: /api/sync/ не отдает строки моложе TASK_SYNC_DELAY.
+    for event in make_ids_events(action, rows):
+        publish(event)
+
+
+async def load_changes(user, since, limit):
+    changes = []
+    for name, (model, serializer_class) in MODELS.items():
+        queryset = model.objects.filter(updated_at__gt=since)
+        if not user.is_staff:
+            queryset = queryset.filter(owner=user)
+        changes += [(instance.updated_at, name, instance) async for instance in
+                    queryset.order_by('updated_at')[:limit].aiterator()]
+    return [make_event(name, instance, 'deleted' if instance.deleted else 'updated')
+            for _, name, instance in sorted(changes, key=lambda change: change[0])]
+
+
+async def load_archived(user, since, limit):
+    # задачи, перенесенные archive_tasks, приходят как удаленные
+    queryset = TaskArchive.objects.filter(archived_at__gt=since)
+    if not user.is_staff:
+        queryset = queryset.filter(owner_id=user.pk)
+    return [row async for row in queryset.order_by('archived_at', 'id').values_list('id', 'owner_id')[:limit]]
+
+
+async def replay(user, since):
+    since = since - timedelta(seconds=settings.TASK_SYNC_DELAY)
+    changes = await load_changes(user, since, settings.EVENTS_REPLAY_LIMIT + 1)
+    archived = await load_archived(user, since, settings.EVENTS_REPLAY_LIMIT + 1)
+    if len(changes) + len(archived) <= settings.EVENTS_REPLAY_LIMIT:
+        return changes + make_ids_events('deleted', archived)
+    # Слишком много пропущено: клиент проходит /api/sync/, а строки моложе TASK_SYNC_DELAY,
+    # которых sync еще не отдает, приходят следом событиями.
+    recent = await load_changes(user, timezone.now() - timedelta(seconds=settings.TASK_SYNC_DELAY),
+                                settings.EVENTS_REPLAY_LIMIT)
+    return [{'id': None, 'event': 'sync', 'owner': user.pk, 'data': {'action': 'sync'}}, *recent]
+
+
+async def stream(user, since):
+    queue = broker.subscribe(user)
+    if settings.EVENTS_BACKEND == 'postgres':
+        listener.ensure_started()
+    try:
+        yield f'retry: {settings.EVENTS_RETRY_MS}\n\n'
+        if since is not None:
+            for event in await replay(user, since):
+                yield format_event(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # комментарий не дает прокси закрыть простаивающее соединение
+                yield ': keepalive\n\n'
+                continue
+            if event is None:
+                return
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(queue)
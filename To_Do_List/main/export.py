@@ -0,0 +1,52 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+COLUMNS = (
+    ('id', 'id'),
+    ('created_by', 'created_by'),
+    ('owner', 'owner_id'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('status', 'status'),
+    ('completed', 'completed'),
+    ('created_at', 'created_at'),
+    ('completed_at', 'completed_at'),
+    ('updated_at', 'updated_at'),
+    ('deleted_at', 'deleted_at'),
+    ('deleted', 'deleted'),
+    ('category', 'category_id'),
+    ('priority', 'priority_id'),
+)
+NAMES = [name for name, _ in COLUMNS]
+FIELDS = [field for _, field in COLUMNS]
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def to_ndjson(rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(NAMES, row))) + '\n'
+
+
+def to_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(NAMES)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+FORMATS = {
+    'ndjson': (to_ndjson, 'application/x-ndjson'),
+    'csv': (to_csv, 'text/csv'),
+}
+
+
+def stream(queryset, output, chunk_size):
+    render, content_type = FORMATS[output]
+    rows = queryset.order_by('id').values_list(*FIELDS).iterator(chunk_size=chunk_size)
+    return render(rows), content_type
@@ -0,0 +1,90 @@
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+def parse_bool(value):
+    if value.lower() in ('true', '1'):
+        return True
+    if value.lower() in ('false', '0'):
+        return False
+    raise ValueError(value)
+
+
+def parse_moment(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime.combine(day, time.min)
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def parse_list(parse):
+    return lambda value: [parse(item) for item in value.split(',')]
+
+
+FIELDS = {
+    'id': int,
+    'status': str,
+    'category': int,
+    'priority': int,
+    'owner': int,
+    'created_by': str,
+}
+
+DATE_FIELDS = ('created_at', 'updated_at', 'completed_at', 'deleted_at')
+
+FILTERS = {
+    **FIELDS,
+    **{f'{name}__in': parse_list(parse) for name, parse in FIELDS.items()},
+    **{f'{name}__{lookup}': parse_moment for name in DATE_FIELDS for lookup in ('gt', 'gte', 'lt', 'lte')},
+    'completed': parse_bool,
+    'deleted': parse_bool,
+    # для поиска по тексту есть /api/tasks/search/, здесь только заголовок под триграммным индексом
+    'title__icontains': str,
+}
+
+# сортировки, для которых есть индексы (см. Task.Meta.indexes); последним всегда идет id,
+# чтобы порядок был однозначным для курсорной пагинации.
+ORDERINGS = {
+    '-created_at': ('-created_at', '-id'),
+    'created_at': ('created_at', 'id'),
+    '-updated_at': ('-updated_at', '-id'),
+    'updated_at': ('updated_at', 'id'),
+    'status': ('status', '-created_at', '-id'),
+    'category': ('category_id', '-created_at', '-id'),
+    'priority': ('priority_id', '-created_at', '-id'),
+}
+
+
+class TaskFilterBackend(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        lookups = {}
+        errors = {}
+        for param, parse in FILTERS.items():
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                lookups[param] = parse(value)
+            except (TypeError, ValueError):
+                errors[param] = 'Invalid value.'
+
+        if errors:
+            raise ValidationError(errors)
+        return queryset.filter(**lookups)
+
+
+class TaskOrderingFilter(OrderingFilter):
+    def get_ordering(self, request, queryset, view):
+        name = request.query_params.get(self.ordering_param)
+        if name is None:
+            return None
+        if name not in ORDERINGS:
+            raise ValidationError({self.ordering_param: f'Expected one of: {", ".join(ORDERINGS)}.'})
+        return ORDERINGS[name]
@@ -0,0 +1,118 @@
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import bulk, cascade, export
+from .models import Job, Task, Category, Priority
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+def enqueue(user, kind, params, total=None):
+    return Job.objects.create(owner=user, kind=kind, params=params, total=total)
+
+
+def is_background(request):
+    return request.query_params.get('background', '').lower() in ('1', 'true')
+
+
+def set_progress(job, progress):
+    job.progress = progress
+    job.save(update_fields=['progress', 'total', 'updated_at'])
+
+
+def claim():
+    # SKIP LOCKED позволяет запускать несколько воркеров: каждый берет свою задачу.
+    # Задача, которая давно не сообщала о прогрессе, считается брошенной упавшим воркером.
+    stale = timezone.now() - timedelta(seconds=settings.TASK_JOB_TIMEOUT)
+    with transaction.atomic():
+        job = (Job.objects.select_for_update(skip_locked=True)
+               .filter(Q(status=Job.QUEUED) | Q(status=Job.RUNNING, updated_at__lt=stale))
+               .order_by('created_at', 'id').first())
+        if job is not None:
+            job.status = Job.RUNNING
+            job.started_at = timezone.now()
+            job.save(update_fields=['status', 'started_at', 'updated_at'])
+    return job
+
+
+def run(job):
+    try:
+        job.result = HANDLERS[job.kind](job)
+        job.status = Job.DONE
+    except Exception:
+        # error отдается клиенту, поэтому трассировка с путями и SQL уходит только в лог
+        logger.exception('Job %s (%s) failed', job.pk, job.kind)
+        job.error = f'The job failed. Reference: job {job.pk}.'
+        job.status = Job.FAILED
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def get_tasks(user):
+    tasks = Task.objects.all()
+    if not user.is_staff:
+        tasks = tasks.filter(deleted=False, owner=user)
+    return tasks
+
+
+@handler('export')
+def export_tasks(job):
+    output = job.params['output']
+    tasks = get_tasks(job.owner)
+    job.total = tasks.count()
+    content, _ = export.stream(tasks, output, settings.TASK_EXPORT_CHUNK_SIZE)
+
+    with tempfile.TemporaryFile() as file:
+        for line in content:
+            file.write(line.encode())
+            job.progress += 1
+            if job.progress % settings.TASK_EXPORT_CHUNK_SIZE == 0:
+                set_progress(job, job.progress)
+        job.file.save(f'tasks-{job.pk}.{output}', File(file), save=False)
+    # у csv первая строка - заголовок
+    job.progress = job.total
+    return {'rows': job.total}
+
+
+@handler('bulk')
+def bulk_tasks(job):
+    items = job.params['items']
+    job.total = len(items)
+    results = []
+    for start in range(0, len(items), settings.TASK_BULK_BATCH_SIZE):
+        chunk = bulk.HANDLERS[job.params['method']](job.owner, items[start:start + settings.TASK_BULK_BATCH_SIZE])
+        for result in chunk:
+            result['index'] += start
+        results += chunk
+        set_progress(job, len(results))
+    return results
+
+
+@handler('destroy')
+def destroy_related(job):
+    model = {'category': Category, 'priority': Priority}[job.params['model']]
+    instance = model.objects.filter(pk=job.params['id']).first()
+    if instance is None:
+        return {'tasks': 0}
+
+    # задачи удаляются пачками, чтобы не держать одну долгую транзакцию над всеми задачами категории
+    job.total = cascade.count_tasks(instance)['tasks']
+    deleted = cascade.delete(instance, progress=lambda done: set_progress(job, done))
+    return {'tasks': deleted}
@@ -0,0 +1,104 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from main import cache, events
+from main.models import Task, Category, Priority, TaskArchive, CategoryArchive, PriorityArchive
+
+MOVE_SQL = '''
+WITH moved AS (
+    DELETE FROM {table} WHERE id IN (
+        SELECT id FROM {table} WHERE {condition}
+        LIMIT %(batch_size)s FOR UPDATE SKIP LOCKED
+    )
+    RETURNING {columns}
+)
+INSERT INTO {archive} ({columns}) SELECT {columns} FROM moved
+RETURNING id, owner_id
+'''
+
+TASK_CONDITION = '''
+(deleted AND deleted_at < %(deleted_before)s)
+OR (completed AND NOT deleted AND completed_at < %(completed_before)s)
+'''
+
+# категорию и приоритет можно перенести, только когда на них не ссылается ни одна задача
+UNUSED_CONDITION = '''
+deleted AND deleted_at < %(deleted_before)s
+AND NOT EXISTS (SELECT 1 FROM {task_table} WHERE {task_table}.{column} = {table}.id)
+'''
+
+
+def get_move_sql(model, archive, condition):
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in archive._meta.concrete_fields if field.name != 'archived_at')
+    return MOVE_SQL.format(
+        table=quote(model._meta.db_table),
+        archive=quote(archive._meta.db_table),
+        columns=columns,
+        condition=condition.format(
+            table=quote(model._meta.db_table),
+            task_table=quote(Task._meta.db_table),
+            column=quote(f'{model._meta.model_name}_id'),
+        ),
+    )
+
+
+class Command(BaseCommand):
+    help = ('Moves soft-deleted rows and old completed tasks into the archive tables in short batches. '
+            'Safe to run from cron while the API is serving requests.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--deleted-days', type=int, default=settings.TASK_ARCHIVE_DELETED_DAYS,
+                            help='Archive rows soft-deleted more than this many days ago.')
+        parser.add_argument('--completed-days', type=int, default=settings.TASK_ARCHIVE_COMPLETED_DAYS,
+                            help='Archive tasks completed more than this many days ago.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Pause in seconds between batches to let other writers through.')
+
+    def handle(self, *args, **options):
+        # /api/sync/ принимает токены возрастом до TASK_ARCHIVE_DELETED_DAYS и узнает об удалении
+        # по строке с deleted; если перенести ее раньше, клиент с таким токеном удаления не увидит
+        if options['deleted_days'] < settings.TASK_ARCHIVE_DELETED_DAYS:
+            raise CommandError(f'--deleted-days must be at least TASK_ARCHIVE_DELETED_DAYS '
+                               f'({settings.TASK_ARCHIVE_DELETED_DAYS}), sync tokens are valid that long.')
+        now = timezone.now()
+        params = {
+            'deleted_before': now - timedelta(days=options['deleted_days']),
+            'completed_before': now - timedelta(days=options['completed_days']),
+            'batch_size': options['batch_size'],
+        }
+        for model, archive, condition in (
+            (Task, TaskArchive, TASK_CONDITION),
+            (Category, CategoryArchive, UNUSED_CONDITION),
+            (Priority, PriorityArchive, UNUSED_CONDITION),
+        ):
+            moved = self.archive(get_move_sql(model, archive, condition), params, options['sleep'], model is Task)
+            self.stdout.write(f'{model.__name__}: {moved} rows archived')
+
+    @staticmethod
+    def archive(sql, params, sleep, publish):
+        moved = 0
+        while True:
+            # каждая пачка - отдельная короткая транзакция; строки, занятые другими запросами,
+            # пропускаются (SKIP LOCKED) и переносятся при следующем запуске.
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                # завершенные задачи уходят из таблицы живыми, подключенные клиенты узнают об этом
+                # из события, остальные - из archived_tasks в /api/sync/
+                if publish:
+                    events.publish_ids('deleted', rows)
+            if not rows:
+                return moved
+            moved += len(rows)
+            cache.bump(*{owner_id for _, owner_id in rows})
+            if len(rows) < params['batch_size']:
+                return moved
+            if sleep:
+                time.sleep(sleep)
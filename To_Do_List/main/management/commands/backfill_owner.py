@@ -0,0 +1,37 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min, OuterRef, Subquery
+
+from main.models import Task, Category, Priority
+
+
+class Command(BaseCommand):
+    help = 'Fills owner from the created_by username in small batches of primary keys.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Pause in seconds between batches to let other writers through.')
+
+    def handle(self, *args, **options):
+        for model in (Category, Priority, Task):
+            updated = self.backfill(model, options['batch_size'], options['sleep'])
+            self.stdout.write(f'{model.__name__}: {updated} rows updated')
+
+    @staticmethod
+    def backfill(model, batch_size, sleep):
+        pending = model.objects.filter(owner__isnull=True)
+        bounds = pending.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            return 0
+
+        owner = Subquery(User.objects.filter(username=OuterRef('created_by')).values('pk')[:1])
+        updated = 0
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            # каждая пачка - отдельная короткая транзакция, блокируются только ее строки.
+            updated += pending.filter(pk__gte=start, pk__lt=start + batch_size).update(owner=owner)
+            if sleep:
+                time.sleep(sleep)
+        return updated
@@ -0,0 +1,84 @@
+import json
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from rest_framework.authtoken.models import Token
+
+from main import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway test database with generated users, categories, priorities and tasks and measures '
+            'latency, throughput and query count of every task endpoint for each dataset size. '
+            'Results are written as JSON and can be compared against a stored baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000',
+                            help='Comma separated numbers of tasks per user, one run per size.')
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--categories', type=int, default=10, help='Categories per user.')
+        parser.add_argument('--priorities', type=int, default=5, help='Priorities per user.')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--cached', action='store_true', help='Let repeated requests hit the response cache.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', help='JSON file of an earlier run to compare against.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed p50 slowdown against the baseline, 0.2 means 20%%.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The schema uses Postgres features (full-text search, partial indexes, triggers), '
+                               'run the benchmark against a Postgres database.')
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)['results']
+
+        setup_test_environment()
+        databases = setup_databases(options['verbosity'], interactive=False, keepdb=options['keepdb'])
+        try:
+            # без ограничения частоты: замер делает сотни запросов от одного пользователя подряд
+            with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}):
+                results = {str(size): self.run(size, options) for size in sizes}
+        finally:
+            teardown_databases(databases, options['verbosity'], keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = {
+            'options': {name: options[name] for name in
+                        ('users', 'categories', 'priorities', 'requests', 'seed', 'cached')},
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+
+        if baseline is not None:
+            regressions = benchmark.compare(results, baseline, options['threshold'])
+            if regressions:
+                raise CommandError('Slower than the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write('No regressions against the baseline.')
+
+    def run(self, size, options):
+        call_command('flush', interactive=False, verbosity=0)
+        user = benchmark.seed(options['users'], options['categories'], options['priorities'], size,
+                              seed=options['seed'])[0]
+        client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.get(user=user).key}')
+
+        results = {}
+        self.stdout.write(f'{size} tasks per user:')
+        for name, url in benchmark.get_endpoints(user).items():
+            result = benchmark.measure(client, user, url, options['requests'], options['cached'])
+            if result['status'] != 200:
+                raise CommandError(f'{url} returned {result["status"]}.')
+            results[name] = result
+            self.stdout.write(f'  {name:<18} p50 {result["p50_ms"]:>8} ms  p99 {result["p99_ms"]:>8} ms  '
+                              f'{result["rps"]:>7} req/s  {result["queries"]:>3} queries')
+        return results
@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+
+class Command(BaseCommand):
+    help = ('Measures API throughput in-process against the configured database. '
+            'With --compare it first runs with a new database connection per request.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='admin')
+        parser.add_argument('--url', default='/api/tasks/')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--compare', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["username"]}" does not exist.')
+        token, _ = Token.objects.get_or_create(user=user)
+        connections.close_all()
+
+        # Без лимитов второй прогон не упирается в ведро, опустошенное первым, а с TIMEOUT=0 ответы
+        # не кешируются (версии хранятся без таймаута), и каждый запрос действительно идет в базу.
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+                               CACHES={**settings.CACHES, 'tasks': {**settings.CACHES['tasks'], 'TIMEOUT': 0}}):
+            self.compare(token, options)
+
+    def compare(self, token, options):
+        database = settings.DATABASES['default']
+        if options['compare']:
+            configured = database['CONN_MAX_AGE'], database['OPTIONS'].pop('pool', None)
+            database['CONN_MAX_AGE'] = 0
+            self.report('connection per request', self.run(token, options))
+            database['CONN_MAX_AGE'], pool = configured
+            if pool is not None:
+                database['OPTIONS']['pool'] = pool
+
+        mode = 'pool' if 'pool' in database['OPTIONS'] else f'CONN_MAX_AGE={database["CONN_MAX_AGE"]}'
+        self.report(mode, self.run(token, options))
+
+    def run(self, token, options):
+        host = next((host for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost').lstrip('.')
+        per_thread = options['requests'] // options['threads']
+
+        def worker(_):
+            client = Client(HTTP_AUTHORIZATION=f'Token {token.key}', HTTP_HOST=host)
+            failures = 0
+            for _ in range(per_thread):
+                failures += client.get(options['url']).status_code != 200
+                # тестовый клиент отключает close_old_connections от request_finished,
+                # без этого соединение жило бы весь прогон при любом CONN_MAX_AGE
+                close_old_connections()
+            connections.close_all()
+            return failures
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['threads']) as executor:
+            failures = sum(executor.map(worker, range(options['threads'])))
+        elapsed = time.perf_counter() - started
+        return per_thread * options['threads'], failures, elapsed
+
+    def report(self, mode, result):
+        total, failures, elapsed = result
+        self.stdout.write(f'{mode}: {total} requests, {failures} failed, '
+                          f'{elapsed:.2f}s, {total / elapsed:.0f} req/s')
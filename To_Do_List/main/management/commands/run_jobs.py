@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from main import jobs
+
+
+class Command(BaseCommand):
+    help = ('Runs queued background jobs (exports, bulk changes, category and priority deletes). '
+            'Start as many workers as needed, each job is taken by one of them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty.')
+        parser.add_argument('--sleep', type=float, default=settings.TASK_JOB_POLL_INTERVAL,
+                            help='Seconds to wait before polling an empty queue again.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = jobs.claim()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+
+            job = jobs.run(job)
+            self.stdout.write(f'Job {job.pk} ({job.kind}): {job.status}')
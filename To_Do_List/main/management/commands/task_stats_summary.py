@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from main.stats import TRIGGER_SQL, DROP_TRIGGER_SQL, REBUILD_SQL
+
+
+class Command(BaseCommand):
+    help = ('Maintains the main_taskstatssummary table used by /api/tasks/stats/ when TASK_STATS_SUMMARY is on. '
+            '"enable" installs the trigger that keeps it up to date and fills it, '
+            '"rebuild" recounts it, "disable" removes the trigger.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['enable', 'rebuild', 'disable'])
+
+    def handle(self, *args, **options):
+        params = {'time_zone': settings.TIME_ZONE}
+        with transaction.atomic(), connection.cursor() as cursor:
+            if options['action'] == 'disable':
+                cursor.execute(DROP_TRIGGER_SQL)
+            else:
+                if options['action'] == 'enable':
+                    cursor.execute(TRIGGER_SQL, params)
+                cursor.execute(REBUILD_SQL, params)
+        self.stdout.write(f'Task stats summary: {options["action"]} done')
@@ -0,0 +1,72 @@
+import bisect
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # значения меток -> [счетчики по корзинам..., +Inf], сумма
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(labels) or ([0] * (len(self.buckets) + 1), 0)
+            counts[index] += 1
+            self._series[labels] = (counts, total + value)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            pairs = [f'{name}="{value}"' for name, value in zip(self.labels, labels)]
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                bucket_labels = ','.join([*pairs, f'le="{bound}"'])
+                lines.append(f'{self.name}_bucket{{{bucket_labels}}} {cumulative}')
+            series_labels = ','.join(pairs)
+            lines.append(f'{self.name}_sum{{{series_labels}}} {total}')
+            lines.append(f'{self.name}_count{{{series_labels}}} {cumulative}')
+        return '\n'.join(lines)
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time spent on the request.', ('method', 'endpoint', 'status'), LATENCY_BUCKETS)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries made by the request.', ('method', 'endpoint'), QUERY_BUCKETS)
+DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries.', ('method', 'endpoint'), LATENCY_BUCKETS)
+SERIALIZATION_DURATION = Histogram(
+    'http_request_serialization_duration_seconds', 'Time spent in serializers, including lazy queries they make.',
+    ('method', 'endpoint'), LATENCY_BUCKETS)
+RENDER_DURATION = Histogram(
+    'http_request_render_duration_seconds', 'Time spent rendering the response body.', ('method', 'endpoint'),
+    LATENCY_BUCKETS)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Size of the response body.', ('method', 'endpoint'), SIZE_BUCKETS)
+
+HISTOGRAMS = (REQUEST_DURATION, DB_QUERIES, DB_DURATION, SERIALIZATION_DURATION, RENDER_DURATION, RESPONSE_SIZE)
+
+
+def metrics_view(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    content = '\n'.join(histogram.render() for histogram in HISTOGRAMS) + '\n'
+    return HttpResponse(content, content_type='text/plain; version=0.0.4; charset=utf-8')
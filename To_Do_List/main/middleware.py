@@ -0,0 +1,266 @@
+import gzip
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from . import metrics, routers
+
+logger = logging.getLogger('main.performance')
+
+# метрики текущего запроса, чтобы сериализаторы могли добавить к ним свое время
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.db_time = 0.0
+        self.render_started = None
+        self.render_time = 0.0
+        self.serialization_time = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.db_time += duration
+            self.queries.append((sql, duration))
+
+    def start_render(self, response):
+        self.render_started = time.perf_counter()
+        response.add_post_render_callback(self.finish_render)
+
+    def finish_render(self, response):
+        self.render_time = time.perf_counter() - self.render_started
+
+
+@contextmanager
+def measure_serialization():
+    data = current_metrics.get()
+    # вложенные сериализаторы (?expand=) уже входят во время внешнего
+    if data is None or data.serializing:
+        yield
+        return
+    data.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        data.serialization_time += time.perf_counter() - started
+        data.serializing = False
+
+
+def timed_representation(to_representation):
+    # serializer.data вычисляется внутри view, поэтому время считается здесь, а не при рендеринге
+    @wraps(to_representation)
+    def wrapper(self, instance):
+        with measure_serialization():
+            return to_representation(self, instance)
+    return wrapper
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        request.metrics = RequestMetrics()
+        token = current_metrics.set(request.metrics)
+        try:
+            with self.install(request.metrics):
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.record(request, response)
+
+    async def __acall__(self, request):
+        # Под ASGI синхронные view и асинхронный ORM работают в потоке запроса (sync_to_async с
+        # thread_sensitive), и у этого потока свои соединения. Обертка ставится на них в том же потоке.
+        request.metrics = RequestMetrics()
+        token = current_metrics.set(request.metrics)
+        stack = await sync_to_async(self.install)(request.metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            current_metrics.reset(token)
+        return self.record(request, response)
+
+    @staticmethod
+    def install(metrics):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(metrics))
+        return stack
+
+    def process_template_response(self, request, response):
+        request.metrics.start_render(response)
+        return response
+
+    def record(self, request, response):
+        data = request.metrics
+        duration = time.perf_counter() - data.started
+        match = request.resolver_match
+        endpoint = match.view_name if match else 'unmatched'
+        if endpoint == 'metrics':
+            return response
+
+        size = 0 if response.streaming else len(response.content)
+        metrics.REQUEST_DURATION.observe(duration, request.method, endpoint, str(response.status_code))
+        metrics.DB_QUERIES.observe(len(data.queries), request.method, endpoint)
+        metrics.DB_DURATION.observe(data.db_time, request.method, endpoint)
+        metrics.SERIALIZATION_DURATION.observe(data.serialization_time, request.method, endpoint)
+        metrics.RENDER_DURATION.observe(data.render_time, request.method, endpoint)
+        metrics.RESPONSE_SIZE.observe(size, request.method, endpoint)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={data.db_time * 1000:.1f};desc="{len(data.queries)} queries"',
+            f'serialize;dur={data.serialization_time * 1000:.1f}',
+            f'render;dur={data.render_time * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ])
+
+        if duration * 1000 >= settings.PERFORMANCE_SLOW_REQUEST_MS:
+            queries = '\n'.join(f'  {query_time * 1000:.1f} ms: {sql}' for sql, query_time in
+                                data.queries[:settings.PERFORMANCE_SLOW_LOG_QUERIES])
+            logger.warning('Slow request %s %s: %.1f ms, %d queries in %.1f ms\n%s',
+                           request.method, request.get_full_path(), duration * 1000, len(data.queries),
+                           data.db_time * 1000, queries)
+        return response
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routers.read_from_replica.set(self.can_use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.read_from_replica.reset(token)
+        return self.after_response(request, response)
+
+    async def __acall__(self, request):
+        token = routers.read_from_replica.set(await self.acan_use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.read_from_replica.reset(token)
+        if self.should_pin(request, response):
+            await routers.apin(request)
+        return response
+
+    @staticmethod
+    def can_use_replica(request):
+        # после своей записи клиент какое-то время читает с основной базы и видит свои изменения
+        return bool(settings.REPLICA_DATABASES) and request.method in ('GET', 'HEAD', 'OPTIONS') \
+            and not routers.is_pinned(request)
+
+    @staticmethod
+    async def acan_use_replica(request):
+        return bool(settings.REPLICA_DATABASES) and request.method in ('GET', 'HEAD', 'OPTIONS') \
+            and not await routers.ais_pinned(request)
+
+    @staticmethod
+    def should_pin(request, response):
+        return bool(settings.REPLICA_DATABASES) and request.method not in ('GET', 'HEAD', 'OPTIONS') \
+            and response.status_code < 400
+
+    def after_response(self, request, response):
+        if self.should_pin(request, response):
+            routers.pin(request)
+        return response
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+    accept_encoding_re = _lazy_re_compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        # потоковые ответы (экспорт, поток событий) отдаются частями и не сжимаются
+        if response.streaming or response.has_header('Content-Encoding') \
+                or len(response.content) < settings.COMPRESSION_MIN_SIZE \
+                or not response.get('Content-Type', '').startswith(settings.COMPRESSION_CONTENT_TYPES):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encodings = self.get_accepted_encodings(request)
+        if brotli is not None and 'br' in encodings:
+            encoding, content = 'br', brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        elif 'gzip' in encodings:
+            encoding, content = 'gzip', gzip.compress(
+                response.content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        # сжатое тело отличается побайтно, поэтому ETag становится слабым, как в GZipMiddleware
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    def get_accepted_encodings(self, request):
+        encodings = set()
+        for item in request.headers.get('Accept-Encoding', '').split(','):
+            match = self.accept_encoding_re.match(item)
+            if match is None:
+                continue
+            try:
+                quality = float(match[2]) if match[2] else 1
+            except ValueError:
+                continue
+            if quality > 0:
+                encodings.add(match[1].lower())
+        return encodings
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:00
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='category',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['created_by', 'id'], name='category_live_owner_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='priority',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['created_by', 'id'], name='priority_live_owner_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['-created_at', '-id'], name='task_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='task_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['created_by', '-created_at', '-id'], name='task_live_owner_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['created_by', 'status', '-created_at', '-id'], name='task_live_owner_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['created_by', 'category', '-created_at', '-id'], name='task_live_owner_category_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['created_by', 'priority', '-created_at', '-id'], name='task_live_owner_priority_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:01
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('main', '0003_task_owner'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='category',
+            index=models.Index(fields=['owner'], name='category_owner_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='category',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['owner', 'id'], name='category_live_user_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='priority',
+            index=models.Index(fields=['owner'], name='priority_owner_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='priority',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['owner', 'id'], name='priority_live_user_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['owner'], name='task_owner_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['owner', '-created_at', '-id'], name='task_live_user_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['owner', 'status', '-created_at', '-id'], name='task_live_user_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['owner', 'category', '-created_at', '-id'], name='task_live_user_category_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['owner', 'priority', '-created_at', '-id'], name='task_live_user_priority_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='category',
+            name='category_live_owner_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='priority',
+            name='priority_live_owner_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='task',
+            name='task_live_owner_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='task',
+            name='task_live_owner_status_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='task',
+            name='task_live_owner_category_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='task',
+            name='task_live_owner_priority_idx',
+        ),
+    ]
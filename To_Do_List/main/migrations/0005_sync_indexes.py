@@ -0,0 +1,46 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:08
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('main', '0004_owner_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='category',
+            index=models.Index(fields=['owner', 'updated_at'], name='category_owner_updated_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='priority',
+            index=models.Index(fields=['owner', 'updated_at'], name='priority_owner_updated_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['updated_at'], name='task_updated_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['owner', 'updated_at'], name='task_owner_updated_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='category',
+            name='category_owner_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='priority',
+            name='priority_owner_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='task',
+            name='task_owner_idx',
+        ),
+    ]
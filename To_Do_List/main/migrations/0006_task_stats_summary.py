@@ -0,0 +1,30 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStatsSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner_id', models.IntegerField(null=True)),
+                ('status', models.CharField(max_length=20)),
+                ('category_id', models.BigIntegerField()),
+                ('priority_id', models.BigIntegerField()),
+                ('completed', models.BooleanField()),
+                ('deleted', models.BooleanField()),
+                ('completed_day', models.DateField(null=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('owner_id', 'status', 'category_id', 'priority_id', 'completed', 'deleted', 'completed_day'), name='task_stats_summary_bucket', nulls_distinct=False)],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:20
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+# Adding a STORED generated column rewrites main_task: Postgres computes the vector for every
+# row while holding an ACCESS EXCLUSIVE lock, so all reads and writes of tasks wait until the
+# migration finishes (and the table temporarily needs twice its disk space). On a large table
+# apply it in a maintenance window; the rewrite takes about as long as a VACUUM FULL of main_task.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_task_stats_summary'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='task',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('title', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('description', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:20
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('main', '0007_task_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='task',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='task_search_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='task_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:29
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_task_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(null=True)),
+                ('created_by', models.CharField(max_length=100)),
+                ('owner_id', models.IntegerField(null=True)),
+                ('deleted', models.BooleanField()),
+                ('archived_at', models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PriorityArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(null=True)),
+                ('created_by', models.CharField(max_length=100)),
+                ('owner_id', models.IntegerField(null=True)),
+                ('deleted', models.BooleanField()),
+                ('archived_at', models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TaskArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_by', models.CharField(max_length=100)),
+                ('owner_id', models.IntegerField(null=True)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('status', models.CharField(max_length=20)),
+                ('completed', models.BooleanField()),
+                ('created_at', models.DateTimeField()),
+                ('completed_at', models.DateTimeField(null=True)),
+                ('updated_at', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(null=True)),
+                ('deleted', models.BooleanField()),
+                ('category_id', models.BigIntegerField()),
+                ('priority_id', models.BigIntegerField()),
+                ('archived_at', models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:29
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('main', '0009_archive'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', True)), fields=['deleted_at'], name='task_deleted_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed', True), ('deleted', False)), fields=['completed_at'], name='task_completed_at_idx'),
+        ),
+    ]
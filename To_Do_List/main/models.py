@@ -1,4 +1,11 @@
+from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Now
+
+SEARCH_CONFIG = 'english'
 
 
 class Category(models.Model):
@@ -8,8 +15,16 @@ class Category(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     deleted_at = models.DateTimeField(null=True, blank=True)
     created_by = models.CharField(max_length=100, default='system')
+    owner = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, db_index=False,
+                              related_name='+')
     deleted = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'updated_at'], name='category_owner_updated_idx'),
+            models.Index(fields=['owner', 'id'], condition=Q(deleted=False), name='category_live_user_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -20,14 +35,24 @@ class Priority(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     deleted_at = models.DateTimeField(null=True, blank=True)
     created_by = models.CharField(max_length=100, default='system')
+    owner = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, db_index=False,
+                              related_name='+')
     deleted = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'updated_at'], name='priority_owner_updated_idx'),
+            models.Index(fields=['owner', 'id'], condition=Q(deleted=False), name='priority_live_user_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 
 class Task(models.Model):
     created_by = models.CharField(max_length=100, default='system')
+    owner = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, db_index=False,
+                              related_name='+')
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     status = models.CharField(max_length=20, default="Pending")
@@ -39,6 +64,129 @@ class Task(models.Model):
     deleted = models.BooleanField(default=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     priority = models.ForeignKey(Priority, on_delete=models.CASCADE)
+    # вектор считает сама база при каждой записи, в т.ч. при bulk_create и update()
+    search_vector = models.GeneratedField(
+        expression=SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            # индексы повторяют порядок курсорной пагинации (-created_at, -id)
+            models.Index(fields=['-created_at', '-id'], name='task_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='task_status_idx'),
+            models.Index(fields=['updated_at'], name='task_updated_idx'),
+            models.Index(fields=['owner', 'updated_at'], name='task_owner_updated_idx'),
+            models.Index(fields=['owner', '-created_at', '-id'],
+                         condition=Q(deleted=False), name='task_live_user_idx'),
+            models.Index(fields=['owner', 'status', '-created_at', '-id'],
+                         condition=Q(deleted=False), name='task_live_user_status_idx'),
+            models.Index(fields=['owner', 'category', '-created_at', '-id'],
+                         condition=Q(deleted=False), name='task_live_user_category_idx'),
+            models.Index(fields=['owner', 'priority', '-created_at', '-id'],
+                         condition=Q(deleted=False), name='task_live_user_priority_idx'),
+            GinIndex(fields=['search_vector'], name='task_search_idx'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='task_title_trgm_idx'),
+            # кандидаты в архив, см. команду archive_tasks
+            models.Index(fields=['deleted_at'], condition=Q(deleted=True), name='task_deleted_at_idx'),
+            models.Index(fields=['completed_at'], condition=Q(completed=True, deleted=False),
+                         name='task_completed_at_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class TaskStatsSummary(models.Model):
+    owner_id = models.IntegerField(null=True)
+    status = models.CharField(max_length=20)
+    category_id = models.BigIntegerField()
+    priority_id = models.BigIntegerField()
+    completed = models.BooleanField()
+    deleted = models.BooleanField()
+    completed_day = models.DateField(null=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner_id', 'status', 'category_id', 'priority_id', 'completed', 'deleted', 'completed_day'],
+                nulls_distinct=False,
+                name='task_stats_summary_bucket',
+            ),
+        ]
+
+
+# Архив: те же колонки без внешних ключей, строки переносит команда archive_tasks.
+class CategoryArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    deleted_at = models.DateTimeField(null=True)
+    created_by = models.CharField(max_length=100)
+    owner_id = models.IntegerField(null=True)
+    deleted = models.BooleanField()
+    archived_at = models.DateTimeField(db_default=Now(), db_index=True)
+
+
+class PriorityArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=50)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    deleted_at = models.DateTimeField(null=True)
+    created_by = models.CharField(max_length=100)
+    owner_id = models.IntegerField(null=True)
+    deleted = models.BooleanField()
+    archived_at = models.DateTimeField(db_default=Now(), db_index=True)
+
+
+class TaskArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    created_by = models.CharField(max_length=100)
+    owner_id = models.IntegerField(null=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    status = models.CharField(max_length=20)
+    completed = models.BooleanField()
+    created_at = models.DateTimeField()
+    completed_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField()
+    deleted_at = models.DateTimeField(null=True)
+    deleted = models.BooleanField()
+    category_id = models.BigIntegerField()
+    priority_id = models.BigIntegerField()
+    archived_at = models.DateTimeField(db_default=Now(), db_index=True)
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUSES, default=QUEUED)
+    progress = models.IntegerField(default=0)
+    total = models.IntegerField(null=True)
+    result = models.JSONField(null=True)
+    file = models.FileField(upload_to='jobs/', blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-created_at'], name='job_owner_created_idx'),
+            # очередь: воркер берет самую старую ожидающую задачу
+            models.Index(fields=['created_at'], condition=Q(status='queued'), name='job_queued_idx'),
+        ]
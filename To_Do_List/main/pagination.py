@@ -0,0 +1,95 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class TaskCursorPagination(CursorPagination):
+    page_size = getattr(settings, 'TASK_PAGE_SIZE', 100)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'TASK_MAX_PAGE_SIZE', 1000)
+    ordering = ('-created_at', '-id')
+    salt = 'main.pagination'
+
+    # Курсор DRF хранит только первое поле сортировки и смещение (не больше offset_cutoff), поэтому
+    # на сортировке вроде ?ordering=status страницы начинают повторяться, когда у тысячи строк одно
+    # значение. Здесь курсор хранит все поля сортировки последней строки, а следующая страница
+    # выбирается условием (a, b, id) "после" этих значений.
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(self.get_ordering(request, queryset, view))
+
+        values, reverse = self.decode_cursor(request)
+        ordering = self.ordering if not reverse else tuple(map(invert, self.ordering))
+        if values is not None:
+            queryset = queryset.filter(get_after_filter(ordering, values))
+
+        page = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+        self.has_next = has_more if not reverse else True
+        self.has_previous = values is not None if not reverse else has_more
+        self.page = page
+        return page
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            ordering, values, reverse = signing.loads(token, salt=self.salt)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        # курсор от другой сортировки не подходит
+        if tuple(ordering) != self.ordering:
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def encode_cursor(self, item, reverse):
+        values = [get_value(item, name.lstrip('-')) for name in self.ordering]
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+        token = signing.dumps([self.ordering, values, reverse], salt=self.salt)
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+
+def invert(name):
+    return name[1:] if name.startswith('-') else f'-{name}'
+
+
+def get_value(item, name):
+    # страница состоит из строк values() или из моделей (при ?expand=)
+    return item[name] if isinstance(item, dict) else getattr(item, name)
+
+
+def get_after_filter(ordering, values):
+    # (a > x) or (a = x and b < y) or (a = x and b = y and id < z) для ordering = (a, -b, -id)
+    condition = Q(pk__in=[])
+    equal = Q()
+    for name, value in zip(ordering, values):
+        field = name.lstrip('-')
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{field}__{lookup}': value})
+        equal &= Q(**{field: value})
+    return condition
@@ -0,0 +1,103 @@
+import hashlib
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from . import cache
+
+# True, пока обрабатывается запрос, которому можно читать с реплики (см. ReplicaMiddleware)
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+LAG_SQL = '''
+SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END
+'''
+
+
+class ReplicaHealth:
+    def __init__(self):
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked_at, healthy = self._checked.get(alias, (None, None))
+            if checked_at is not None and now - checked_at < settings.REPLICA_LAG_CHECK_INTERVAL:
+                return healthy
+            # пока идет проверка, остальные потоки используют прежний результат
+            self._checked[alias] = (now, healthy if healthy is not None else False)
+        healthy = self.check(alias)
+        with self._lock:
+            self._checked[alias] = (now, healthy)
+        return healthy
+
+    @staticmethod
+    def check(alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            return False
+        # на самой основной базе функции репликации возвращают NULL
+        return lag is None or lag <= settings.REPLICA_MAX_LAG
+
+    def clear(self):
+        with self._lock:
+            self._checked.clear()
+
+
+health = ReplicaHealth()
+
+
+def get_client_key(request):
+    credentials = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    credentials = credentials or request.META.get('REMOTE_ADDR', '')
+    return f'replica:pin:{hashlib.md5(credentials.encode()).hexdigest()}'
+
+
+# метка хранится в общем кеше, чтобы ее видели все воркеры
+def pin(request):
+    cache.get_cache().set(get_client_key(request), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(request):
+    return cache.get_cache().get(get_client_key(request)) is not None
+
+
+# варианты для ASGI: синхронный запрос к Redis остановил бы цикл событий
+async def apin(request):
+    await cache.get_cache().aset(get_client_key(request), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+async def ais_pinned(request):
+    return await cache.get_cache().aget(get_client_key(request)) is not None
+
+
+def uses_replica():
+    # Строки с отстающей реплики нельзя класть в кеш ответов и помечать ETag текущей версии:
+    # другой читатель получил бы их под версией, которая их уже не описывает.
+    return read_from_replica.get() and any(health.is_healthy(alias) for alias in settings.REPLICA_DATABASES)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not read_from_replica.get():
+            return 'default'
+        replicas = [alias for alias in settings.REPLICA_DATABASES if health.is_healthy(alias)]
+        return random.choice(replicas) if replicas else 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # реплики получают схему через репликацию
+        return db not in settings.REPLICA_DATABASES
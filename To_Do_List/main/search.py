@@ -0,0 +1,25 @@
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, TrigramSimilarity
+from django.db.models import F, TextField, Value
+from django.db.models.functions import Concat
+
+from .models import SEARCH_CONFIG
+
+
+def search(tasks, text, limit):
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    found = tasks.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query),
+        # совпадение может быть и в заголовке, поэтому фрагменты берутся из заголовка и описания
+        headline=SearchHeadline(Concat('title', Value('. '), 'description', output_field=TextField()),
+                                query, config=SEARCH_CONFIG, max_fragments=2),
+    ).order_by('-rank', '-id')[:limit]
+    found = list(found)
+    if found:
+        return found
+
+    # опечатки и части слов полнотекстовый поиск не находит - ищем по похожести заголовка.
+    # title % text использует триграммный GIN индекс, порог похожести задает pg_trgm.similarity_threshold.
+    return list(tasks.filter(title__trigram_similar=text).annotate(
+        rank=TrigramSimilarity('title', text),
+        headline=F('title'),
+    ).order_by('-rank', '-id')[:limit])
@@ -1,38 +1,149 @@
+from datetime import datetime
+
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.utils.functional import cached_property
 from rest_framework import serializers
-from .models import Task, Category, Priority
+from rest_framework.permissions import SAFE_METHODS
+from .middleware import timed_representation
+from .models import Task, Category, Priority, Job
+
+
+class TimedSerializerMixin:
+    # время сериализации попадает в Server-Timing и /metrics, см. main.middleware
+    @timed_representation
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = '__all__'
+        read_only_fields = ('owner', 'created_at', 'updated_at', 'deleted_at', 'deleted')
+
+
+class PrioritySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Priority
+        fields = '__all__'
+        read_only_fields = ('owner', 'created_at', 'updated_at', 'deleted_at', 'deleted')
 
 
 class TaskSerializer(serializers.ModelSerializer):
+    expandable_fields = {
+        'category': CategorySerializer,
+        'priority': PrioritySerializer,
+    }
+    readable_fields = ('id', 'created_by', 'owner', 'title', 'description', 'status', 'completed', 'created_at',
+                       'completed_at', 'updated_at', 'deleted_at', 'deleted', 'category', 'priority')
+
     class Meta:
         model = Task
-        fields = '__all__'
-        read_only_fields = ('created_by', 'created_at', 'updated_at', 'deleted_at', 'deleted')
+        exclude = ('search_vector',)
+        read_only_fields = ('created_by', 'owner', 'created_at', 'updated_at', 'deleted_at', 'deleted')
+
+    @classmethod
+    def get_expanded_fields(cls, request):
+        if request is None:
+            return []
+        names = request.query_params.get('expand', '').split(',')
+        return [name for name in cls.expandable_fields if name in names]
+
+    @classmethod
+    def get_requested_fields(cls, request):
+        if request is None or request.method not in SAFE_METHODS or not request.query_params.get('fields'):
+            return []
+        names = request.query_params['fields'].split(',') + cls.get_expanded_fields(request)
+        unknown = [name for name in names if name not in cls.readable_fields]
+        if unknown:
+            raise serializers.ValidationError({'fields': f'Unknown fields: {", ".join(unknown)}.'})
+        return [name for name in cls.readable_fields if name in names]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        names = self.get_requested_fields(self.context.get('request'))
+        if not names:
+            return fields
+        return {name: field for name, field in fields.items() if name in names or name not in self.readable_fields}
+
+    @cached_property
+    def expanded_serializers(self):
+        names = self.get_expanded_fields(self.context.get('request'))
+        return {name: self.expandable_fields[name]() for name in names}
+
+    @timed_representation
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        for name, serializer in self.expanded_serializers.items():
+            data[name] = serializer.to_representation(getattr(instance, name))
+        return data
 
     def update(self, instance, validated_data):
-        if validated_data.get('is_completed'):
-            instance.completed_at = timezone.now()
-        else:
-            instance.completed_at = None
+        self.set_completed_at(instance, validated_data)
         return super().update(instance, validated_data)
 
+    @staticmethod
+    def set_completed_at(instance, validated_data):
+        if 'completed' not in validated_data:
+            return
+        if not validated_data['completed']:
+            instance.completed_at = None
+        elif not instance.completed:
+            instance.completed_at = timezone.now()
 
-class CategorySerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Category
-        fields = '__all__'
-        read_only_fields = ('created_at', 'updated_at', 'deleted_at', 'deleted')
 
+class TaskListSerializer(serializers.BaseSerializer):
+    # только для чтения: строки из values() превращаются в тот же JSON, что дает TaskSerializer,
+    # без создания моделей и без разбора полей ModelSerializer на каждый запрос.
+    columns = {'owner': 'owner_id', 'category': 'category_id', 'priority': 'priority_id'}
+    datetime_field = serializers.DateTimeField()
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.field_names = fields or TaskSerializer.readable_fields
+
+    @classmethod
+    def get_columns(cls, names):
+        return [cls.columns.get(name, name) for name in names or TaskSerializer.readable_fields]
+
+    @timed_representation
+    def to_representation(self, row):
+        data = {}
+        for name in self.field_names:
+            value = row[self.columns.get(name, name)]
+            data[name] = self.datetime_field.to_representation(value) if isinstance(value, datetime) else value
+        return data
 
-class PrioritySerializer(serializers.ModelSerializer):
+
+class TaskSearchSerializer(TaskSerializer):
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.CharField(read_only=True)
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        prefetched = self.context.get('prefetched', {}).get(self.field_name)
+        if prefetched is None:
+            return super().to_internal_value(data)
+        try:
+            return prefetched[int(data)]
+        except (KeyError, TypeError, ValueError):
+            self.fail('does_not_exist', pk_value=data)
+
+
+class BulkTaskSerializer(TaskSerializer):
+    category = PrefetchedPrimaryKeyRelatedField(queryset=Category.objects.all())
+    priority = PrefetchedPrimaryKeyRelatedField(queryset=Priority.objects.all())
+
+
+class JobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
-        model = Priority
-        fields = '__all__'
-        read_only_fields = ('created_at', 'updated_at', 'deleted_at', 'deleted')
+        model = Job
+        exclude = ('params', 'file')
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = '__all__'
@@ -0,0 +1,49 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import cache, events
+from .authentication import token_cache
+from .models import Task, Category, Priority
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Priority)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Priority)
+def invalidate_task_cache(sender, instance, **kwargs):
+    # Сигналы приходят внутри транзакции (Collector.delete, save в atomic). Если поднять версию
+    # до фиксации, параллельный запрос прочитает новую версию со старыми строками и закеширует их.
+    owner_id = instance.owner_id
+    transaction.on_commit(lambda: cache.bump(owner_id))
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Priority)
+def publish_saved(sender, instance, created, **kwargs):
+    action = 'created' if created else 'deleted' if instance.deleted else 'updated'
+    events.publish(events.make_event(sender._meta.model_name, instance, action))
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Priority)
+def publish_deleted(sender, instance, **kwargs):
+    events.publish(events.make_event(sender._meta.model_name, instance, 'deleted', timezone.now()))
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    token_cache.pop(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    token_cache.pop_user(instance.pk)
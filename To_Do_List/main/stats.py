@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Task, TaskStatsSummary
+
+DIMENSIONS = ('status', 'category', 'priority', 'completed', 'completed_per_day')
+
+TRIGGER_SQL = '''
+CREATE OR REPLACE FUNCTION main_task_stats_summary() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND
+       ROW(OLD.owner_id, OLD.status, OLD.category_id, OLD.priority_id, OLD.completed, OLD.deleted,
+           (OLD.completed_at AT TIME ZONE %(time_zone)s)::date) IS NOT DISTINCT FROM
+       ROW(NEW.owner_id, NEW.status, NEW.category_id, NEW.priority_id, NEW.completed, NEW.deleted,
+           (NEW.completed_at AT TIME ZONE %(time_zone)s)::date) THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE main_taskstatssummary SET count = count - 1
+        WHERE owner_id IS NOT DISTINCT FROM OLD.owner_id AND status = OLD.status
+          AND category_id = OLD.category_id AND priority_id = OLD.priority_id
+          AND completed = OLD.completed AND deleted = OLD.deleted
+          AND completed_day IS NOT DISTINCT FROM (OLD.completed_at AT TIME ZONE %(time_zone)s)::date;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO main_taskstatssummary
+            (owner_id, status, category_id, priority_id, completed, deleted, completed_day, count)
+        VALUES (NEW.owner_id, NEW.status, NEW.category_id, NEW.priority_id, NEW.completed, NEW.deleted,
+                (NEW.completed_at AT TIME ZONE %(time_zone)s)::date, 1)
+        ON CONFLICT (owner_id, status, category_id, priority_id, completed, deleted, completed_day)
+        DO UPDATE SET count = main_taskstatssummary.count + 1;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS main_task_stats_summary ON main_task;
+CREATE TRIGGER main_task_stats_summary AFTER INSERT OR UPDATE OR DELETE ON main_task
+FOR EACH ROW EXECUTE FUNCTION main_task_stats_summary();
+'''
+
+DROP_TRIGGER_SQL = '''
+DROP TRIGGER IF EXISTS main_task_stats_summary ON main_task;
+DROP FUNCTION IF EXISTS main_task_stats_summary();
+'''
+
+REBUILD_SQL = '''
+LOCK TABLE main_task IN SHARE ROW EXCLUSIVE MODE;
+DELETE FROM main_taskstatssummary;
+INSERT INTO main_taskstatssummary
+    (owner_id, status, category_id, priority_id, completed, deleted, completed_day, count)
+SELECT owner_id, status, category_id, priority_id, completed, deleted,
+       (completed_at AT TIME ZONE %(time_zone)s)::date, COUNT(*)
+FROM main_task
+GROUP BY 1, 2, 3, 4, 5, 6, 7;
+'''
+
+
+def get_task_rows(request, since):
+    tasks = Task.objects.all()
+    if not request.user.is_staff:
+        tasks = tasks.filter(deleted=False, owner=request.user)
+    day = Case(When(completed_at__gte=since, then=TruncDate('completed_at')), default=None)
+    return tasks.annotate(day=day, n=Value(1)).values_list(
+        'status', 'category_id', 'priority_id', 'completed', 'day', 'n')
+
+
+def get_summary_rows(request, since):
+    summary = TaskStatsSummary.objects.filter(count__gt=0)
+    if not request.user.is_staff:
+        summary = summary.filter(deleted=False, owner_id=request.user.pk)
+    day = Case(When(completed_day__gte=timezone.localdate(since), then=F('completed_day')), default=None)
+    return summary.annotate(day=day, n=F('count')).values_list(
+        'status', 'category_id', 'priority_id', 'completed', 'day', 'n')
+
+
+def get_stats(request, days):
+    since = timezone.now() - timedelta(days=days)
+    rows = get_summary_rows(request, since) if settings.TASK_STATS_SUMMARY else get_task_rows(request, since)
+    sql, params = rows.query.sql_with_params()
+
+    # один проход по таблице: каждое измерение - отдельный набор группировки.
+    grouped = f'''
+        SELECT status, category_id, priority_id, completed, day,
+               GROUPING(status), GROUPING(category_id), GROUPING(priority_id), GROUPING(completed), GROUPING(day),
+               SUM(n)
+        FROM ({sql}) AS rows (status, category_id, priority_id, completed, day, n)
+        GROUP BY GROUPING SETS ((status), (category_id), (priority_id), (completed), (day), ())
+    '''
+    with connections[rows.db].cursor() as cursor:
+        cursor.execute(grouped, params)
+        result = cursor.fetchall()
+
+    stats = {'total': 0, **{name: {} for name in DIMENSIONS}}
+    for row in result:
+        values, grouping, count = row[:5], row[5:10], int(row[10] or 0)
+        if 0 not in grouping:
+            stats['total'] = count
+            continue
+        index = grouping.index(0)
+        value = values[index]
+        if value is None:
+            continue
+        stats[DIMENSIONS[index]][str(value).lower() if isinstance(value, bool) else str(value)] = count
+    return stats
@@ -1,13 +1,32 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
-from .models import Task, Category, Priority
+from . import benchmark, bulk, cache, events, jobs, metrics, renderers, routers, throttling
+from .middleware import ReplicaMiddleware
+from .models import Task, Category, Priority, TaskArchive, CategoryArchive
 
 
 class TaskModelTest(TestCase):
     def setUp(self):
         self.user = TaskViewTest.create_user(username='username')
-        self.task = TaskViewTest.create_task(created_by=self.user.username)
+        self.task = TaskViewTest.create_task(owner=self.user)
 
     def test_task(self):
         result = Task.objects.get(pk=self.task.pk)
@@ -31,6 +50,7 @@ class CategoryModelTest(TestCase):
         self.user = TaskViewTest.create_user(username='username')
         self.category = Category.objects.create(
             created_by=self.user.username,
+            owner=self.user,
             name='category_name',
             description='category_description'
         )
@@ -50,7 +70,7 @@ class CategoryModelTest(TestCase):
 class PriorityModelTest(TestCase):
     def setUp(self):
         self.user = TaskViewTest.create_user(username='username')
-        self.priority = Priority.objects.create(created_by=self.user.username, name='priority_name')
+        self.priority = Priority.objects.create(created_by=self.user.username, owner=self.user, name='priority_name')
 
     def test_category(self):
         result = Priority.objects.get(pk=self.priority.pk)
@@ -63,6 +83,24 @@ class PriorityModelTest(TestCase):
         self.assertFalse(result.deleted)
 
 
+class BackfillOwnerTest(TestCase):
+    def test_owner_is_filled_from_username(self):
+        # владелец проставляется по имени пользователя, неизвестные имена остаются пустыми.
+        user = TaskViewTest.create_user(username='username')
+        category = Category.objects.create(created_by='username', name='category_name')
+        priority = Priority.objects.create(created_by='unknown', name='priority_name')
+        tasks = [Task.objects.create(created_by='username', title='title', category=category, priority=priority)
+                 for _ in range(3)]
+
+        call_command('backfill_owner', batch_size=2, stdout=StringIO())
+
+        category.refresh_from_db()
+        priority.refresh_from_db()
+        self.assertEqual(user.pk, category.owner_id)
+        self.assertIsNone(priority.owner_id)
+        self.assertEqual(3, Task.objects.filter(pk__in=[task.pk for task in tasks], owner=user).count())
+
+
 class UserModelTest(TestCase):
     def setUp(self):
         self.user = TaskViewTest.create_user(username='username')
@@ -131,23 +169,23 @@ class TaskViewTest(TestCase):
         self.staff_token = self.create_token(self.staff_user)
         self.non_staff_token = self.create_token(self.non_staff_user)
 
-        self.task1 = self.create_task(created_by=self.staff_user.username)
-        self.task2 = self.create_task(created_by=self.non_staff_user.username)
+        self.task1 = self.create_task(owner=self.staff_user)
+        self.task2 = self.create_task(owner=self.non_staff_user)
 
     def test_staff_user_can_get_all_tasks(self):
         # админ может получить все задачи.
         self.client.force_authenticate(user=self.staff_user)
         response = self.client.get(f'/api/tasks/', user=self.staff_user)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(2, len(response.data))
+        self.assertEqual(2, len(response.data['results']))
 
     def test_non_staff_user_can_get_own_tasks(self):
         # пользователь может получить только свои задачи.
         self.client.force_authenticate(user=self.non_staff_user)
         response = self.client.get(f'/api/tasks/', user=self.non_staff_user)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(1, len(response.data))
-        self.assertEqual(self.task2.pk, response.data[0].get('id'))
+        self.assertEqual(1, len(response.data['results']))
+        self.assertEqual(self.task2.pk, response.data['results'][0].get('id'))
 
     def test_staff_user_can_get_any_tasks_by_id(self):
         # админ может получить любую задачу по айди.
@@ -158,7 +196,7 @@ class TaskViewTest(TestCase):
         self.assertEqual(self.task2.pk, response1.data.get('id'))
 
         # в том числе удаленную.
-        task3 = self.create_task(created_by=self.non_staff_user.username, deleted=True)
+        task3 = self.create_task(owner=self.non_staff_user, deleted=True)
         response2 = self.client.get(f'/api/tasks/{task3.pk}/', user=self.staff_user)
         self.assertEqual(response2.status_code, 200)
         self.assertEqual(task3.pk, response2.data.get('id'))
@@ -174,7 +212,7 @@ class TaskViewTest(TestCase):
         response2 = self.client.get(f'/api/tasks/{self.task1.pk}/', user=self.non_staff_user)
         self.assertEqual(response2.status_code, 404)
 
-        task3 = self.create_task(created_by=self.non_staff_user.username, deleted=True)
+        task3 = self.create_task(owner=self.non_staff_user, deleted=True)
         response2 = self.client.get(f'/api/tasks/{task3.pk}/', user=self.non_staff_user)
         self.assertEqual(response2.status_code, 404)
 
@@ -201,13 +239,13 @@ class TaskViewTest(TestCase):
         response2 = self.client.patch(f'/api/tasks/{self.task1.pk}/', user=self.non_staff_user)
         self.assertEqual(response2.status_code, 403)
 
-        task3 = self.create_task(created_by=self.non_staff_user.username, deleted=True)
+        task3 = self.create_task(owner=self.non_staff_user, deleted=True)
         response2 = self.client.patch(f'/api/tasks/{task3.pk}/', user=self.non_staff_user)
         self.assertEqual(response2.status_code, 404)
 
     def test_staff_user_can_delete(self):
         # админ может окончательно удалить любую задачу.
-        instance = self.create_task(created_by=self.staff_user.username)
+        instance = self.create_task(owner=self.staff_user)
         self.client.force_authenticate(user=self.staff_user)
 
         response = self.client.delete(f'/api/tasks/{instance.pk}/', user=self.staff_user)
@@ -216,7 +254,7 @@ class TaskViewTest(TestCase):
 
     def test_non_staff_user_can_delete_own_object(self):
         # пользователь может удалить (изменить статус) свою задачу.
-        instance = self.create_task(created_by=self.non_staff_user.username)
+        instance = self.create_task(owner=self.non_staff_user)
         self.client.force_authenticate(user=self.non_staff_user)
         response = self.client.delete(f'/api/tasks/{instance.pk}/', user=self.non_staff_user)
         self.assertEqual(response.status_code, 204)
@@ -224,7 +262,7 @@ class TaskViewTest(TestCase):
 
     def test_non_staff_user_cannot_delete_others_object(self):
         # пользователь не может удалить чужую задачу
-        instance = self.create_task(created_by=self.staff_user.username)
+        instance = self.create_task(owner=self.staff_user)
         self.client.force_authenticate(user=self.non_staff_user)
         response = self.client.delete(f'/api/tasks/{instance.pk}/', user=self.non_staff_user)
         self.assertEqual(response.status_code, 403)
@@ -232,12 +270,41 @@ class TaskViewTest(TestCase):
 
     def user_cannot_delete_already_deleted_object(self):
         # пользователь не может удалить уже удаленный объект
-        instance = self.create_task(created_by=self.non_staff_user.username, deleted=True)
+        instance = self.create_task(owner=self.non_staff_user, deleted=True)
         self.client.force_authenticate(user=self.non_staff_user)
         response = self.client.delete(f'/api/tasks/{instance.pk}/', user=self.non_staff_user)
         self.assertEqual(response.status_code, 404)
         self.assertTrue(Task.objects.filter(pk=instance.pk, deleted=True).exists())
 
+    def test_task_list_is_paginated_by_cursor(self):
+        # список задач отдается страницами, следующая страница по курсору.
+        tasks = [self.create_task(owner=self.non_staff_user) for _ in range(4)]
+        self.client.force_authenticate(user=self.non_staff_user)
+
+        response1 = self.client.get('/api/tasks/', {'page_size': 3})
+        self.assertEqual(response1.status_code, 200)
+        self.assertEqual(3, len(response1.data['results']))
+        self.assertIsNone(response1.data['previous'])
+
+        response2 = self.client.get(response1.data['next'])
+        self.assertEqual(response2.status_code, 200)
+        self.assertEqual(2, len(response2.data['results']))
+        self.assertIsNone(response2.data['next'])
+
+        ids = [task['id'] for task in response1.data['results'] + response2.data['results']]
+        expected = [task.pk for task in reversed([self.task2] + tasks)]
+        self.assertEqual(expected, ids)
+
+    def test_tasks_by_status_are_paginated(self):
+        # фильтр по статусу тоже отдается страницами.
+        self.create_task(owner=self.non_staff_user)
+        self.client.force_authenticate(user=self.non_staff_user)
+
+        response = self.client.get('/api/tasks/status/Pending/', {'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(1, len(response.data['results']))
+        self.assertIsNotNone(response.data['next'])
+
     @staticmethod
     def create_user(username, is_staff=False):
         # тестовый пользователь
@@ -251,11 +318,12 @@ class TaskViewTest(TestCase):
         return token
 
     @staticmethod
-    def create_task(created_by, deleted=False):
+    def create_task(owner, deleted=False):
         category = Category.objects.create(name='category_name')
         priority = Priority.objects.create(name='priority_name')
         task = Task.objects.create(
-            created_by=created_by,
+            created_by=owner.username,
+            owner=owner,
             title='title',
             description='description',
             category=category,
@@ -263,3 +331,1072 @@ class TaskViewTest(TestCase):
             deleted=deleted
         )
         return task
+
+
+class TaskBulkTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.other_user = TaskViewTest.create_user(username='other')
+        self.category = Category.objects.create(name='category_name', owner=self.user)
+        self.priority = Priority.objects.create(name='priority_name', owner=self.user)
+        self.other_category = Category.objects.create(name='category_name', owner=self.other_user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_bulk_create_validates_ownership_per_item(self):
+        # пачка создается одним запросом, чужая категория отклоняется только для своего элемента.
+        items = [{'title': f'title{i}', 'category': self.category.pk, 'priority': self.priority.pk}
+                 for i in range(20)]
+        items.append({'title': 'title', 'category': self.other_category.pk, 'priority': self.priority.pk})
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/tasks/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(context.captured_queries), 6)
+
+        self.assertEqual([201] * 20 + [400], [result['status'] for result in response.data])
+        self.assertIn('category', response.data[-1]['errors'])
+        created = Task.objects.filter(owner=self.user)
+        self.assertEqual(20, created.count())
+        self.assertEqual(sorted(created.values_list('pk', flat=True)), [result['id'] for result in response.data[:20]])
+
+    def test_bulk_update(self):
+        # пользователь обновляет свои задачи пачкой, чужие и удаленные отклоняются.
+        own = TaskViewTest.create_task(owner=self.user)
+        deleted = TaskViewTest.create_task(owner=self.user, deleted=True)
+        foreign = TaskViewTest.create_task(owner=self.other_user)
+        items = [
+            {'id': own.pk, 'title': 'new_title', 'completed': True},
+            {'id': deleted.pk, 'title': 'new_title'},
+            {'id': foreign.pk, 'title': 'new_title'},
+            {'id': own.pk, 'priority': self.other_category.pk},
+        ]
+
+        response = self.client.patch('/api/tasks/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([200, 404, 403, 400], [result['status'] for result in response.data])
+
+        own.refresh_from_db()
+        self.assertEqual('new_title', own.title)
+        self.assertTrue(own.completed)
+        self.assertIsNotNone(own.completed_at)
+        foreign.refresh_from_db()
+        self.assertEqual('title', foreign.title)
+
+    def test_bulk_delete(self):
+        # пользователь помечает удаленными только свои задачи, админ удаляет окончательно.
+        own = TaskViewTest.create_task(owner=self.user)
+        foreign = TaskViewTest.create_task(owner=self.other_user)
+
+        response1 = self.client.delete('/api/tasks/bulk/', [own.pk, foreign.pk, 0], format='json')
+        self.assertEqual(response1.status_code, 200)
+        self.assertEqual([204, 403, 404], [result['status'] for result in response1.data])
+        self.assertTrue(Task.objects.filter(pk=own.pk, deleted=True).exists())
+        self.assertTrue(Task.objects.filter(pk=foreign.pk, deleted=False).exists())
+
+        self.client.force_authenticate(user=TaskViewTest.create_user(username='staff', is_staff=True))
+        response2 = self.client.delete('/api/tasks/bulk/', [own.pk, foreign.pk], format='json')
+        self.assertEqual([204, 204], [result['status'] for result in response2.data])
+        self.assertFalse(Task.objects.filter(pk__in=[own.pk, foreign.pk]).exists())
+
+    def test_bulk_requires_list(self):
+        response = self.client.post('/api/tasks/bulk/', {'title': 'title'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class QueryCountMixin:
+    def assertConstantQueries(self, url, create_rows, sizes=(1, 10)):
+        # число запросов не должно зависеть от количества строк в ответе.
+        counts = []
+        for size in sizes:
+            create_rows(size)
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(len(set(counts)), 1, f'{url}: query counts {counts} for sizes {sizes}')
+
+
+class TaskExpandTest(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.client.force_authenticate(user=self.user)
+
+    def create_tasks(self, count):
+        # версия кеша поднимается после фиксации транзакции
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                TaskViewTest.create_task(owner=self.user)
+
+    def test_expand_inlines_category_and_priority(self):
+        # категория и приоритет встраиваются в задачу по ?expand=.
+        task = TaskViewTest.create_task(owner=self.user)
+
+        response1 = self.client.get(f'/api/tasks/{task.pk}/', {'expand': 'category,priority'})
+        self.assertEqual(response1.status_code, 200)
+        self.assertEqual('category_name', response1.data['category']['name'])
+        self.assertEqual('priority_name', response1.data['priority']['name'])
+
+        response2 = self.client.get(f'/api/tasks/{task.pk}/')
+        self.assertEqual(task.category_id, response2.data['category'])
+
+    def test_list_endpoints_use_constant_queries(self):
+        self.assertConstantQueries('/api/tasks/', self.create_tasks)
+        self.assertConstantQueries('/api/tasks/?expand=category,priority', self.create_tasks)
+        self.assertConstantQueries('/api/tasks/status/Pending/?expand=category', self.create_tasks)
+        self.assertConstantQueries('/api/categories/', lambda count: Category.objects.bulk_create(
+            [Category(name='category_name', owner=self.user) for _ in range(count)]))
+
+
+class TaskCacheTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.task = TaskViewTest.create_task(owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_repeated_list_is_served_from_cache(self):
+        # повторный запрос списка не обращается к базе.
+        self.client.get('/api/tasks/')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/tasks/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(0, len(context.captured_queries))
+        self.assertEqual(self.task.pk, response.data['results'][0]['id'])
+
+    def test_writes_invalidate_cache(self):
+        # изменение, удаление и массовые операции сбрасывают кеш пользователя.
+        self.client.get('/api/tasks/')
+
+        # версия кеша поднимается после фиксации транзакции
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/tasks/{self.task.pk}/', {'title': 'new_title'})
+        response1 = self.client.get('/api/tasks/')
+        self.assertEqual('new_title', response1.data['results'][0]['title'])
+
+        self.client.delete('/api/tasks/bulk/', [self.task.pk], format='json')
+        response2 = self.client.get('/api/tasks/')
+        self.assertEqual([], response2.data['results'])
+
+    def test_delete_bumps_version_after_commit(self):
+        # пока удаление не зафиксировано, версия прежняя: иначе под новой версией закешируются старые строки
+        version = cache.get_version(self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.task.delete()
+        self.assertEqual(version, cache.get_version(self.user.pk))
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(version, cache.get_version(self.user.pk))
+
+    def test_cache_stats_are_staff_only(self):
+        response1 = self.client.get('/api/tasks/cache-stats/')
+        self.assertEqual(response1.status_code, 403)
+
+        self.client.force_authenticate(user=TaskViewTest.create_user(username='staff', is_staff=True))
+        response2 = self.client.get('/api/tasks/cache-stats/')
+        self.assertEqual(response2.status_code, 200)
+        self.assertEqual({'hits', 'misses'}, set(response2.data))
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.task = TaskViewTest.create_task(owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_unchanged_list_returns_not_modified(self):
+        # неизменившийся список отдается как 304 без запросов к базе.
+        response1 = self.client.get('/api/tasks/')
+        self.assertEqual(response1.status_code, 200)
+        self.assertIn('Last-Modified', response1)
+
+        with CaptureQueriesContext(connection) as context:
+            response2 = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=response1['ETag'])
+        self.assertEqual(response2.status_code, 304)
+        self.assertEqual(response1['ETag'], response2['ETag'])
+        self.assertEqual(0, len(context.captured_queries))
+
+        response3 = self.client.get('/api/tasks/', HTTP_IF_MODIFIED_SINCE=response1['Last-Modified'])
+        self.assertEqual(response3.status_code, 304)
+
+    def test_write_changes_etag(self):
+        # после изменения задачи ETag меняется и список отдается заново.
+        response1 = self.client.get(f'/api/tasks/{self.task.pk}/')
+        self.client.patch(f'/api/tasks/{self.task.pk}/', {'title': 'new_title'})
+
+        response2 = self.client.get(f'/api/tasks/{self.task.pk}/', HTTP_IF_NONE_MATCH=response1['ETag'])
+        self.assertEqual(response2.status_code, 200)
+        self.assertEqual('new_title', response2.data['title'])
+        self.assertNotEqual(response1['ETag'], response2['ETag'])
+
+    def test_category_and_priority_lists_have_etags(self):
+        for url in ('/api/categories/', '/api/priorities/'):
+            response1 = self.client.get(url)
+            response2 = self.client.get(url, HTTP_IF_NONE_MATCH=response1['ETag'])
+            self.assertEqual(response2.status_code, 304)
+
+    def test_detail_checks_object_before_not_modified(self):
+        # 304 отдается только для существующей своей записи
+        future = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        foreign = TaskViewTest.create_task(owner=TaskViewTest.create_user(username='other'))
+        for url in ('/api/tasks/999999/', f'/api/tasks/{foreign.pk}/', '/api/categories/999999/'):
+            self.assertEqual(404, self.client.get(url, HTTP_IF_MODIFIED_SINCE=future).status_code)
+
+        response1 = self.client.get(f'/api/tasks/{self.task.pk}/')
+        response2 = self.client.get(f'/api/tasks/{self.task.pk}/', HTTP_IF_NONE_MATCH=response1['ETag'])
+        self.assertEqual(304, response2.status_code)
+        self.assertEqual(304, self.client.get(f'/api/tasks/{self.task.pk}/', HTTP_IF_MODIFIED_SINCE=future).status_code)
+
+
+@override_settings(TASK_SYNC_DELAY=0)
+class SyncViewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.other_user = TaskViewTest.create_user(username='other')
+        self.task1 = TaskViewTest.create_task(owner=self.user)
+        self.task2 = TaskViewTest.create_task(owner=self.user)
+        self.deleted_task = TaskViewTest.create_task(owner=self.user, deleted=True)
+        self.foreign_task = TaskViewTest.create_task(owner=self.other_user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_sync_returns_only_changes_since_token(self):
+        # первая синхронизация отдает живые строки, следующая - только изменения и удаления.
+        response1 = self.client.get('/api/sync/')
+        self.assertEqual(response1.status_code, 200)
+        self.assertEqual([self.task1.pk, self.task2.pk], [task['id'] for task in response1.data['tasks']])
+
+        self.client.patch(f'/api/tasks/{self.task1.pk}/', {'title': 'new_title'})
+        self.client.delete(f'/api/tasks/{self.task2.pk}/')
+        self.client.patch(f'/api/tasks/{self.foreign_task.pk}/', {'title': 'new_title'})
+
+        response2 = self.client.get('/api/sync/', {'since': response1.data['token']})
+        self.assertEqual(response2.status_code, 200)
+        tasks = {task['id']: task for task in response2.data['tasks']}
+        self.assertEqual({self.task1.pk, self.task2.pk}, set(tasks))
+        self.assertEqual('new_title', tasks[self.task1.pk]['title'])
+        self.assertTrue(tasks[self.task2.pk]['deleted'])
+        self.assertEqual([], response2.data['categories'])
+
+        response3 = self.client.get('/api/sync/', {'since': response2.data['token']})
+        self.assertEqual([], response3.data['tasks'])
+
+    @override_settings(TASK_SYNC_PAGE_SIZE=1)
+    def test_sync_pages(self):
+        # большая синхронизация идет страницами, token приходит только с последней
+        Task.objects.filter(pk__in=[self.task1.pk, self.task2.pk]).update(updated_at=self.task1.updated_at)
+        response = self.client.get('/api/sync/')
+        pages = [response.data]
+        while response.data['has_more']:
+            self.assertIsNone(response.data['token'])
+            response = self.client.get('/api/sync/', {'cursor': response.data['cursor']})
+            pages.append(response.data)
+        self.assertEqual(2, len(pages))
+        self.assertEqual([self.task1.pk, self.task2.pk], [task['id'] for page in pages for task in page['tasks']])
+        self.assertIsNotNone(pages[-1]['token'])
+        self.assertIsNone(pages[-1]['cursor'])
+
+        response = self.client.get('/api/sync/', {'since': pages[-1]['token']})
+        self.assertEqual([], response.data['tasks'])
+        self.assertFalse(response.data['has_more'])
+
+    def test_invalid_token(self):
+        response = self.client.get('/api/sync/', {'since': 'token'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/sync/', {'cursor': 'cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskExportTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.tasks = [TaskViewTest.create_task(owner=self.user) for _ in range(3)]
+        TaskViewTest.create_task(owner=self.user, deleted=True)
+        TaskViewTest.create_task(owner=TaskViewTest.create_user(username='other'))
+        self.client.force_authenticate(user=self.user)
+
+    def test_export_ndjson(self):
+        # выгрузка отдается потоком, по одной задаче в строке.
+        response = self.client.get('/api/tasks/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual('application/x-ndjson', response['Content-Type'])
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([task.pk for task in self.tasks], [row['id'] for row in rows])
+        self.assertEqual(self.user.pk, rows[0]['owner'])
+        self.assertEqual(self.tasks[0].category_id, rows[0]['category'])
+
+    def test_export_csv(self):
+        response = self.client.get('/api/tasks/export/', {'output': 'csv'})
+        self.assertEqual(response.status_code, 200)
+
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([str(task.pk) for task in self.tasks], [row['id'] for row in rows])
+        self.assertEqual('title', rows[0]['title'])
+
+    def test_unknown_output(self):
+        response = self.client.get('/api/tasks/export/', {'output': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncTaskViewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.token = TaskViewTest.create_token(self.user)
+        self.tasks = [TaskViewTest.create_task(owner=self.user) for _ in range(3)]
+        self.foreign_task = TaskViewTest.create_task(owner=TaskViewTest.create_user(username='other'))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_async_list_pages_through_own_tasks(self):
+        # асинхронный список отдает только свои задачи постранично.
+        response1 = self.client.get('/api/async/tasks/', {'page_size': 2, 'expand': 'category'})
+        self.assertEqual(response1.status_code, 200)
+        data1 = response1.json()
+        self.assertEqual([self.tasks[2].pk, self.tasks[1].pk], [task['id'] for task in data1['results']])
+        self.assertEqual('category_name', data1['results'][0]['category']['name'])
+
+        data2 = self.client.get(data1['next']).json()
+        self.assertEqual([self.tasks[0].pk], [task['id'] for task in data2['results']])
+        self.assertIsNone(data2['next'])
+
+    def test_async_detail_and_filters(self):
+        response1 = self.client.get(f'/api/async/tasks/{self.tasks[0].pk}/')
+        self.assertEqual(response1.status_code, 200)
+        self.assertEqual(self.tasks[0].pk, response1.json()['id'])
+
+        response2 = self.client.get(f'/api/async/tasks/{self.foreign_task.pk}/')
+        self.assertEqual(response2.status_code, 404)
+
+        response3 = self.client.get(f'/api/async/tasks/category/{self.tasks[1].category_id}/')
+        self.assertEqual([self.tasks[1].pk], [task['id'] for task in response3.json()['results']])
+
+        response4 = self.client.get('/api/async/tasks/status/Pending/')
+        self.assertEqual(3, len(response4.json()['results']))
+
+    def test_async_views_require_token(self):
+        self.client.credentials()
+        response = self.client.get('/api/async/tasks/')
+        self.assertEqual(response.status_code, 401)
+
+
+class CachedAuthenticationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.token = TaskViewTest.create_token(self.user)
+
+    def test_token_is_looked_up_once(self):
+        # токен ищется в базе только при первом запросе.
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.client.get('/api/categories/')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in context.captured_queries if 'authtoken_token' in query['sql']])
+
+    def test_deleted_token_and_deactivated_user_are_rejected(self):
+        # удаление токена и деактивация пользователя сразу сбрасывают кеш.
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+
+        self.token.delete()
+        self.assertEqual(self.client.get('/api/categories/').status_code, 401)
+
+        token = TaskViewTest.create_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+        self.assertEqual(self.client.delete(f'/api/users/{self.user.pk}/').status_code, 204)
+        self.assertEqual(self.client.get('/api/categories/').status_code, 401)
+
+    def test_signed_token(self):
+        # подписанный токен не хранится в базе и отзывается сменой пароля.
+        response1 = self.client.post('/api/api-signed-token-auth/',
+                                     {'username': 'username', 'password': 'test_password'})
+        self.assertEqual(response1.status_code, 200)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Signed token')
+        self.assertEqual(self.client.get('/api/categories/').status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Signed {response1.data["token"]}')
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+
+        self.user.set_password('new_password')
+        self.user.save()
+        self.assertEqual(self.client.get('/api/categories/').status_code, 401)
+
+    def test_async_views_accept_signed_tokens(self):
+        response = self.client.post('/api/api-signed-token-auth/',
+                                    {'username': 'username', 'password': 'test_password'})
+        self.client.credentials(HTTP_AUTHORIZATION=f'Signed {response.data["token"]}')
+        self.assertEqual(self.client.get('/api/async/tasks/').status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION='Signed token')
+        self.assertEqual(self.client.get('/api/async/tasks/').status_code, 401)
+
+    def test_cache_is_shared(self):
+        # запись лежит в общем кеше, и удаление токена видно всем воркерам сразу
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.client.get('/api/categories/')
+        shared = caches[settings.AUTH_CACHE_ALIAS]
+        self.assertEqual(self.user.pk, shared.get(f'auth:token:{self.token.key}')[0].pk)
+        self.token.delete()
+        self.assertIsNone(shared.get(f'auth:token:{self.token.key}'))
+
+
+class TaskStatsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.tasks = [TaskViewTest.create_task(owner=self.user) for _ in range(3)]
+        self.tasks[0].status = 'Done'
+        self.tasks[0].completed = True
+        self.tasks[0].completed_at = timezone.now()
+        self.tasks[0].save()
+        TaskViewTest.create_task(owner=self.user, deleted=True)
+        TaskViewTest.create_task(owner=TaskViewTest.create_user(username='other'))
+        self.client.force_authenticate(user=self.user)
+
+    def assertStats(self):
+        response = self.client.get('/api/tasks/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(3, response.data['total'])
+        self.assertEqual({'Pending': 2, 'Done': 1}, response.data['status'])
+        self.assertEqual({'true': 1, 'false': 2}, response.data['completed'])
+        self.assertEqual(1, response.data['category'][str(self.tasks[0].category_id)])
+        self.assertEqual({str(timezone.localdate()): 1}, response.data['completed_per_day'])
+
+    def test_stats_count_only_visible_tasks(self):
+        # удаленные и чужие задачи в статистику пользователя не попадают.
+        self.assertStats()
+
+    def test_stats_from_summary_table(self):
+        # таблица, которую ведет триггер, дает те же цифры, что и подсчет по задачам.
+        call_command('task_stats_summary', 'enable', stdout=StringIO())
+        with override_settings(TASK_STATS_SUMMARY=True):
+            self.assertStats()
+            self.tasks[1].deleted = True
+            self.tasks[1].save()
+            response = self.client.get('/api/tasks/stats/')
+            self.assertEqual(2, response.data['total'])
+
+    def test_invalid_days(self):
+        response = self.client.get('/api/tasks/stats/', {'days': 'week'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskSearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.task = TaskViewTest.create_task(owner=self.user)
+        self.task.title = 'Buy groceries'
+        self.task.description = 'Milk, bread and apples for the weekend'
+        self.task.save()
+        deleted = TaskViewTest.create_task(owner=self.user, deleted=True)
+        Task.objects.filter(pk=deleted.pk).update(title='Buy groceries')
+        foreign = TaskViewTest.create_task(owner=TaskViewTest.create_user(username='other'))
+        Task.objects.filter(pk=foreign.pk).update(title='Buy groceries')
+        self.client.force_authenticate(user=self.user)
+
+    def test_full_text_search(self):
+        # ищутся только свои живые задачи, совпадение подсвечивается в описании.
+        response = self.client.get('/api/tasks/search/', {'q': 'apple'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([self.task.pk], [task['id'] for task in response.data])
+        self.assertIn('<b>apples</b>', response.data[0]['headline'])
+        self.assertGreater(response.data[0]['rank'], 0)
+        self.assertNotIn('search_vector', response.data[0])
+        # совпадение в заголовке тоже подсвечивается
+        response = self.client.get('/api/tasks/search/', {'q': 'groceries'})
+        self.assertIn('<b>groceries</b>', response.data[0]['headline'])
+
+    def test_trigram_fallback(self):
+        # опечатку находит поиск по похожести заголовка.
+        response = self.client.get('/api/tasks/search/', {'q': 'grocries'})
+        self.assertEqual([self.task.pk], [task['id'] for task in response.data])
+        self.assertEqual('Buy groceries', response.data[0]['headline'])
+
+    def test_query_is_required(self):
+        response = self.client.get('/api/tasks/search/')
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskFilterTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.tasks = [TaskViewTest.create_task(owner=self.user) for _ in range(4)]
+        Task.objects.filter(pk__in=[self.tasks[0].pk, self.tasks[1].pk]).update(status='Done', completed=True)
+        Task.objects.filter(pk=self.tasks[1].pk).update(priority=self.tasks[0].priority)
+        self.client.force_authenticate(user=self.user)
+
+    def get_ids(self, params):
+        response = self.client.get('/api/tasks/', params)
+        self.assertEqual(response.status_code, 200)
+        return [task['id'] for task in response.data['results']]
+
+    def test_combined_filters(self):
+        # несколько условий сразу превращаются в один запрос.
+        self.assertEqual([self.tasks[1].pk, self.tasks[0].pk],
+                         self.get_ids({'status': 'Done', 'priority': self.tasks[0].priority_id}))
+        self.assertEqual([self.tasks[3].pk, self.tasks[2].pk], self.get_ids({'completed': 'false'}))
+        self.assertEqual([self.tasks[2].pk, self.tasks[0].pk],
+                         self.get_ids({'category__in': f'{self.tasks[0].category_id},{self.tasks[2].category_id}'}))
+        self.assertEqual(4, len(self.get_ids({'created_at__gte': '2000-01-01', 'created_at__lt': '2100-01-01'})))
+        self.assertEqual([], self.get_ids({'created_at__lt': '2000-01-01T00:00:00Z'}))
+
+    def test_filters_apply_to_actions(self):
+        response = self.client.get('/api/tasks/status/Done/', {'completed': 'false'})
+        self.assertEqual([], response.data['results'])
+
+    def test_ordering(self):
+        self.assertEqual([self.tasks[1].pk, self.tasks[0].pk, self.tasks[2].pk, self.tasks[3].pk],
+                         self.get_ids({'ordering': 'priority'}))
+        self.assertEqual([task.pk for task in self.tasks], self.get_ids({'ordering': 'created_at'}))
+
+    def test_ordering_pages_through_many_equal_values(self):
+        # больше offset_cutoff строк с одним статусом: страницы не повторяются и ничего не теряется
+        task = self.tasks[0]
+        Task.objects.bulk_create([Task(owner=self.user, title='title', category_id=task.category_id,
+                                       priority_id=task.priority_id) for _ in range(1300)])
+        ids, url, pages = [], '/api/tasks/?ordering=status&page_size=400', 0
+        while url:
+            response = self.client.get(url)
+            ids += [task['id'] for task in response.data['results']]
+            url = response.data['next']
+            pages += 1
+        self.assertEqual(4, pages)
+        self.assertEqual(1304, len(set(ids)))
+        self.assertEqual(1304, len(ids))
+
+        previous = self.client.get(response.data['previous']).data
+        self.assertEqual(ids[800:1200], [task['id'] for task in previous['results']])
+
+    def test_invalid_parameters(self):
+        # сортировки без индекса и неверные значения отклоняются.
+        self.assertEqual(self.client.get('/api/tasks/', {'ordering': 'title'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/', {'category': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/', {'created_at__gte': 'yesterday'}).status_code, 400)
+
+
+class SparseFieldsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.task = TaskViewTest.create_task(owner=self.user)
+        Task.objects.filter(pk=self.task.pk).update(completed_at=self.task.created_at)
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_matches_detail(self):
+        # быстрый сериализатор списка отдает то же самое, что и TaskSerializer.
+        detail = self.client.get(f'/api/tasks/{self.task.pk}/').data
+        self.assertEqual([detail], self.client.get('/api/tasks/').data['results'])
+
+    def test_fields_narrow_response_and_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/', {'fields': 'id,title,created_at'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(['id', 'title', 'created_at'], list(response.data['results'][0]))
+        self.assertFalse([query for query in queries if 'description' in query['sql']])
+
+        response = self.client.get(f'/api/tasks/{self.task.pk}/', {'fields': 'title', 'expand': 'category'})
+        self.assertEqual(['title', 'category'], list(response.data))
+        self.assertEqual('category_name', response.data['category']['name'])
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/tasks/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ArchiveTasksTest(TestCase):
+    def setUp(self):
+        self.user = TaskViewTest.create_user(username='username')
+        self.tasks = [TaskViewTest.create_task(owner=self.user) for _ in range(4)]
+        long_ago = timezone.now() - timedelta(days=400)
+        Task.objects.filter(pk=self.tasks[0].pk).update(deleted=True, deleted_at=long_ago)
+        Task.objects.filter(pk=self.tasks[1].pk).update(deleted=True, deleted_at=timezone.now())
+        Task.objects.filter(pk=self.tasks[2].pk).update(completed=True, completed_at=long_ago)
+        Category.objects.filter(pk__in=[self.tasks[0].category_id, self.tasks[3].category_id]).update(
+            deleted=True, deleted_at=long_ago)
+
+    def test_archive_moves_old_rows(self):
+        # переносятся только старые удаленные и давно завершенные задачи.
+        call_command('archive_tasks', '--batch-size', '1', stdout=StringIO())
+
+        self.assertEqual([self.tasks[1].pk, self.tasks[3].pk],
+                         list(Task.objects.order_by('pk').values_list('pk', flat=True)))
+        self.assertEqual([self.tasks[0].pk, self.tasks[2].pk],
+                         list(TaskArchive.objects.order_by('pk').values_list('pk', flat=True)))
+        self.assertEqual('title', TaskArchive.objects.get(pk=self.tasks[2].pk).title)
+
+        # категория, на которую еще ссылается задача, остается на месте.
+        self.assertEqual([self.tasks[0].category_id], list(CategoryArchive.objects.values_list('pk', flat=True)))
+        self.assertTrue(Category.objects.filter(pk=self.tasks[3].category_id).exists())
+
+    @override_settings(TASK_SYNC_DELAY=0)
+    def test_sync_reports_archived_tasks(self):
+        # живая завершенная задача пропадает из таблицы без строки с deleted, клиент узнает о ней из архива
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        token = client.get('/api/sync/').data['token']
+        call_command('archive_tasks', stdout=StringIO())
+
+        response = client.get('/api/sync/', {'since': token})
+        self.assertEqual([self.tasks[0].pk, self.tasks[2].pk], response.data['archived_tasks'])
+        self.assertEqual([], client.get('/api/sync/').data['archived_tasks'])
+
+    def test_deleted_days_must_outlive_sync_tokens(self):
+        with self.assertRaises(CommandError):
+            call_command('archive_tasks', '--deleted-days', str(settings.TASK_ARCHIVE_DELETED_DAYS - 1))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class JobTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.tasks = [TaskViewTest.create_task(owner=self.user) for _ in range(3)]
+        self.client.force_authenticate(user=self.user)
+
+    def run_job(self, response):
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual('queued', response.data['status'])
+        job = jobs.run(jobs.claim())
+        self.assertEqual(response.data['id'], job.pk)
+        self.assertIsNone(jobs.claim())
+        return self.client.get(response['Location'])
+
+    def test_background_export(self):
+        # выгрузка в фоне: 202 с номером задачи, затем файл забирается по ссылке download.
+        response = self.run_job(self.client.get('/api/tasks/export/', {'background': 1, 'output': 'csv'}))
+        self.assertEqual('done', response.data['status'])
+        self.assertEqual(3, response.data['progress'])
+
+        download = self.client.get(f'/api/jobs/{response.data["id"]}/download/')
+        rows = list(csv.DictReader(b''.join(download.streaming_content).decode().splitlines()))
+        self.assertEqual([str(task.pk) for task in self.tasks], [row['id'] for row in rows])
+
+    def test_background_bulk(self):
+        items = [{'title': 'new', 'category': self.tasks[0].category_id, 'priority': self.tasks[0].priority_id}]
+        Category.objects.filter(pk=self.tasks[0].category_id).update(owner=self.user)
+        Priority.objects.filter(pk=self.tasks[0].priority_id).update(owner=self.user)
+
+        response = self.run_job(self.client.post('/api/tasks/bulk/?background=1', items, format='json'))
+        self.assertEqual(201, response.data['result'][0]['status'])
+        self.assertTrue(Task.objects.filter(pk=response.data['result'][0]['id'], title='new').exists())
+
+    def test_background_category_destroy(self):
+        admin = TaskViewTest.create_user(username='admin', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        category = self.tasks[0].category
+        Task.objects.filter(pk=self.tasks[1].pk).update(category=category)
+
+        response = self.run_job(self.client.delete(f'/api/categories/{category.pk}/?background=1'))
+        self.assertEqual({'tasks': 2}, response.data['result'])
+        self.assertFalse(Category.objects.filter(pk=category.pk).exists())
+        self.assertEqual([self.tasks[2].pk], list(Task.objects.values_list('pk', flat=True)))
+
+    def test_failed_job_hides_traceback(self):
+        # клиент видит короткое сообщение, трассировка остается в логе сервера
+        job = jobs.enqueue(self.user, 'export', {'output': 'csv'})
+        with mock.patch.dict(jobs.HANDLERS, {'export': mock.Mock(side_effect=ValueError('SELECT secret'))}), \
+                self.assertLogs('main.jobs', 'ERROR') as logs:
+            jobs.run(jobs.claim())
+        self.assertIn('SELECT secret', logs.output[0])
+
+        response = self.client.get(f'/api/jobs/{job.pk}/')
+        self.assertEqual('failed', response.data['status'])
+        self.assertNotIn('secret', response.data['error'])
+        self.assertNotIn('Traceback', response.data['error'])
+
+    def test_jobs_are_private(self):
+        job = jobs.enqueue(TaskViewTest.create_user(username='other'), 'export', {'output': 'csv'})
+        self.assertEqual(self.client.get(f'/api/jobs/{job.pk}/').status_code, 404)
+
+
+class PerformanceMiddlewareTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        TaskViewTest.create_task(owner=self.user)
+        self.client.force_authenticate(user=self.user)
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get('/api/tasks/')
+        self.assertRegex(response['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, render;dur=[\d.]+, total;dur=')
+
+        content = self.client.get('/metrics').content.decode()
+        # сериализация считается внутри view, отдельно от рендеринга
+        self.assertIn('http_request_serialization_duration_seconds_count{method="GET",endpoint="task-list"} 1', content)
+        self.assertIn('http_request_duration_seconds_count{method="GET",endpoint="task-list",status="200"} 1', content)
+        self.assertIn('http_request_db_queries_count{method="GET",endpoint="task-list"} 1', content)
+        self.assertIn('http_response_size_bytes_bucket{method="GET",endpoint="task-list",le="+Inf"} 1', content)
+        self.assertNotIn('endpoint="metrics"', content)
+
+    @override_settings(PERFORMANCE_SLOW_REQUEST_MS=0)
+    def test_slow_request_log(self):
+        # медленный запрос пишется в лог вместе со своим SQL.
+        with self.assertLogs('main.performance', 'WARNING') as logs:
+            self.client.get('/api/tasks/')
+        self.assertIn('SELECT', logs.output[0])
+        self.assertIn('main_task', logs.output[0])
+
+    async def test_asgi_requests_count_queries(self):
+        # под ASGI считаются запросы и синхронных DRF view, и асинхронных view
+        token = await sync_to_async(TaskViewTest.create_token)(self.user)
+        client = AsyncClient()
+        for url in ('/api/tasks/', '/api/async/tasks/'):
+            response = await client.get(url, headers={'Authorization': f'Token {token.key}'})
+            self.assertEqual(200, response.status_code)
+            self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    def test_metrics_allowed_ips(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+
+class BenchmarkTest(TestCase):
+    def test_seed_and_measure(self):
+        # генератор создает N пользователей x M категорий/приоритетов x K задач.
+        users = benchmark.seed(users=2, categories=3, priorities=2, tasks=10)
+        self.assertEqual(6, Category.objects.count())
+        self.assertEqual(4, Priority.objects.count())
+        self.assertEqual(20, Task.objects.count())
+        self.assertEqual(10, Task.objects.filter(owner=users[0], category__owner=users[0]).count())
+
+        client = APIClient()
+        client.force_authenticate(user=users[0])
+        result = benchmark.measure(client, users[0], '/api/tasks/', requests=3)
+        self.assertEqual(200, result['status'])
+        self.assertGreater(result['queries'], 0)
+
+    def test_compare_with_baseline(self):
+        baseline = {'100': {'task-list': {'p50_ms': 10, 'queries': 2}}}
+        self.assertEqual([], benchmark.compare({'100': {'task-list': {'p50_ms': 11, 'queries': 2}}}, baseline, 0.2))
+        self.assertEqual(2, len(benchmark.compare(
+            {'100': {'task-list': {'p50_ms': 13, 'queries': 3}}}, baseline, 0.2)))
+
+
+@override_settings(REPLICA_DATABASES=['default'])
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        routers.health.clear()
+        self.factory = RequestFactory()
+        self.used = []
+
+    def get_response(self, request):
+        # запоминаем, куда роутер отправил бы чтение во время запроса
+        self.used.append(routers.ReplicaRouter().db_for_read(Task) if routers.read_from_replica.get() else None)
+        return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+    def test_read_your_writes(self):
+        middleware = ReplicaMiddleware(self.get_response)
+        middleware(self.factory.get('/api/tasks/', HTTP_AUTHORIZATION='Token one'))
+        middleware(self.factory.post('/api/tasks/', HTTP_AUTHORIZATION='Token one'))
+        middleware(self.factory.get('/api/tasks/', HTTP_AUTHORIZATION='Token one'))
+        middleware(self.factory.get('/api/tasks/', HTTP_AUTHORIZATION='Token two'))
+        # после записи клиент читает с основной базы, другие клиенты - с реплики
+        self.assertEqual(['default', None, None, 'default'], self.used)
+        self.assertFalse(routers.read_from_replica.get())
+
+    async def test_async_read_your_writes(self):
+        # под ASGI метка читается и ставится через aget/aset, без синхронных вызовов кеша
+        async def get_response(request):
+            self.used.append(routers.read_from_replica.get())
+            return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+        middleware = ReplicaMiddleware(get_response)
+        with mock.patch.object(routers, 'is_pinned', side_effect=AssertionError), \
+                mock.patch.object(routers, 'pin', side_effect=AssertionError):
+            await middleware(self.factory.get('/api/tasks/', HTTP_AUTHORIZATION='Token async'))
+            await middleware(self.factory.post('/api/tasks/', HTTP_AUTHORIZATION='Token async'))
+            await middleware(self.factory.get('/api/tasks/', HTTP_AUTHORIZATION='Token async'))
+        self.assertEqual([True, False, False], self.used)
+
+    def test_unhealthy_replica_is_skipped(self):
+        with mock.patch.object(routers.ReplicaHealth, 'check', return_value=False) as check:
+            token = routers.read_from_replica.set(True)
+            try:
+                self.assertEqual('default', routers.ReplicaRouter().db_for_read(Task))
+                routers.ReplicaRouter().db_for_read(Task)
+            finally:
+                routers.read_from_replica.reset(token)
+        # результат проверки кешируется на REPLICA_LAG_CHECK_INTERVAL
+        check.assert_called_once_with('default')
+        self.assertFalse(routers.ReplicaRouter().allow_migrate('default', 'main'))
+
+    def test_replica_reads_are_not_cached(self):
+        user = TaskViewTest.create_user(username='username')
+        category = Category.objects.create(name='category_name', owner=user)
+        priority = Priority.objects.create(name='priority_name', owner=user)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        # ответ с реплики не попадает в общий кеш и не получает ETag
+        with mock.patch.object(cache, 'store') as store:
+            response = client.get('/api/tasks/')
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn('ETag', response)
+        store.assert_not_called()
+
+        item = {'title': 'title', 'category': category.pk, 'priority': priority.pk}
+        self.assertEqual(201, client.post('/api/tasks/', item, format='json').status_code)
+        with mock.patch.object(cache, 'store') as store:
+            response = client.get('/api/tasks/')
+        self.assertIn('ETag', response)
+        store.assert_called_once()
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+
+class ThrottlingTest(TestCase):
+    def setUp(self):
+        throttling.BACKENDS['local'].clear()
+        caches[settings.THROTTLE_CACHE_ALIAS].clear()
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.category = Category.objects.create(name='category_name', owner=self.user)
+        self.priority = Priority.objects.create(name='priority_name', owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def assertThrottledAfter(self, count, request):
+        for _ in range(count):
+            self.assertNotEqual(request().status_code, 429)
+        response = request()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    @throttle_rates(user='2/min')
+    def test_user_bucket(self):
+        # асинхронные view расходуют то же ведро пользователя
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {TaskViewTest.create_token(self.user).key}')
+        self.assertThrottledAfter(2, lambda: self.client.get('/api/tasks/'))
+        response = self.client.get('/api/async/tasks/')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    @throttle_rates(user='2/min')
+    @override_settings(THROTTLE_BACKEND='cache')
+    def test_shared_cache_bucket(self):
+        self.assertThrottledAfter(2, lambda: self.client.get('/api/tasks/'))
+
+    @throttle_rates(user='2/min')
+    @override_settings(THROTTLE_BACKEND='cache')
+    def test_async_views_use_async_cache_calls(self):
+        # асинхронные view не блокируют цикл событий синхронными запросами к кешу
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {TaskViewTest.create_token(self.user).key}')
+        with mock.patch.object(throttling.CacheBackend, 'acquire', side_effect=AssertionError):
+            self.assertThrottledAfter(2, lambda: self.client.get('/api/async/tasks/'))
+
+    @throttle_rates(auth='2/min', bulk='1/min')
+    def test_auth_and_bulk_buckets(self):
+        # отдельные лимиты для выдачи токенов (по адресу) и для пакетных запросов
+        self.assertThrottledAfter(2, lambda: APIClient().post(
+            '/api/api-token-auth/', {'username': 'username', 'password': 'wrong'}))
+        self.assertThrottledAfter(1, lambda: self.client.post('/api/tasks/bulk/', [], format='json'))
+        self.assertEqual(self.client.get('/api/tasks/').status_code, 200)
+
+    @override_settings(TASK_QUOTA_PER_USER=2)
+    def test_task_quota(self):
+        item = {'title': 'title', 'category': self.category.pk, 'priority': self.priority.pk}
+        self.assertEqual(self.client.post('/api/tasks/', item, format='json').status_code, 201)
+        response = self.client.post('/api/tasks/bulk/', [item, item], format='json')
+        self.assertEqual([201, 403], [result['status'] for result in response.data])
+        # проверка квоты не считает все задачи пользователя
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.post('/api/tasks/', item, format='json').status_code, 403)
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+        self.assertEqual(2, Task.objects.filter(owner=self.user).count())
+
+
+class EventStreamTest(TestCase):
+    def setUp(self):
+        self.client = AsyncClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.other_user = TaskViewTest.create_user(username='other')
+        self.authorization = f'Token {TaskViewTest.create_token(self.user).key}'
+
+    def save_tasks(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='category_name', owner=self.user)
+            TaskViewTest.create_task(owner=self.other_user)
+            task = TaskViewTest.create_task(owner=self.user)
+            task.title = 'changed'
+            task.save()
+        return task
+
+    async def read_event(self, stream):
+        chunk = await asyncio.wait_for(anext(stream), timeout=5)
+        return dict(line.split(': ', 1) for line in chunk.decode().strip().split('\n'))
+
+    async def test_live_events_of_own_tasks(self):
+        response = await self.client.get('/api/events/', headers={'Authorization': self.authorization})
+        self.assertEqual('text/event-stream', response['Content-Type'])
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+
+        task = await sync_to_async(self.save_tasks)()
+        # задачи другого пользователя в поток не попадают
+        self.assertEqual('category', (await self.read_event(stream))['event'])
+        created = await self.read_event(stream)
+        updated = await self.read_event(stream)
+        self.assertEqual('task', created['event'])
+        self.assertEqual({'action': 'created', 'id': task.pk}, {
+            key: value for key, value in json.loads(created['data']).items() if key != 'task'})
+        self.assertEqual('changed', json.loads(updated['data'])['task']['title'])
+        self.assertEqual(task.updated_at, events.load_token(updated['id']))
+        await stream.aclose()
+
+    async def test_bulk_changes_carry_ids(self):
+        # пакетные изменения приходят с id задач, которые клиент сразу может запросить
+        response = await self.client.get('/api/events/', headers={'Authorization': self.authorization})
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+
+        def bulk_update():
+            self.tasks = [TaskViewTest.create_task(owner=self.user) for _ in range(2)]
+            with self.captureOnCommitCallbacks(execute=True):
+                bulk.update_many(self.user, [{'id': task.pk, 'status': 'Done'} for task in self.tasks])
+        await sync_to_async(bulk_update)()
+        event = await self.read_event(stream)
+        self.assertEqual('task', event['event'])
+        ids = json.loads(event['data'])['ids']
+        self.assertEqual({'action': 'updated', 'ids': [task.pk for task in self.tasks]}, json.loads(event['data']))
+        await stream.aclose()
+
+        client = APIClient()
+        await sync_to_async(client.force_authenticate)(user=self.user)
+        response = await sync_to_async(client.get)('/api/tasks/', {'id__in': ','.join(map(str, ids))})
+        self.assertEqual(['Done', 'Done'], [task['status'] for task in response.data['results']])
+
+    async def test_resume_from_last_event_id(self):
+        since = events.make_token(timezone.now() - timedelta(seconds=10))
+        task = await sync_to_async(self.save_tasks)()
+        headers = {'Authorization': self.authorization, 'Last-Event-ID': since}
+        response = await self.client.get('/api/events/', headers=headers)
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        # пропущенные изменения приходят из базы по порядку, по одному событию на строку
+        replayed = [await self.read_event(stream) for _ in range(2)]
+        self.assertEqual(['category', 'task'], [event['event'] for event in replayed])
+        self.assertEqual({'action': 'updated', 'id': task.pk}, {
+            key: value for key, value in json.loads(replayed[1]['data']).items() if key != 'task'})
+        await stream.aclose()
+
+        headers = {'Authorization': self.authorization, 'Last-Event-ID': 'bad'}
+        response = await self.client.get('/api/events/', headers=headers)
+        self.assertEqual(400, response.status_code)
+
+
+class CompressionTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.client.force_authenticate(user=self.user)
+        self.task = TaskViewTest.create_task(owner=self.user)
+        for _ in range(20):
+            TaskViewTest.create_task(owner=self.user)
+
+    def test_gzip_above_threshold(self):
+        plain = self.client.get('/api/tasks/')
+        response = self.client.get('/api/tasks/', HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual('gzip', response['Content-Encoding'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertLess(len(response.content) * 3, len(plain.content))
+        self.assertEqual(plain.content, gzip.decompress(response.content))
+
+        # маленький ответ отдается как есть
+        response = self.client.get(f'/api/tasks/{self.task.pk}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    @skipUnless(renderers.msgpack, 'msgpack is not installed')
+    def test_msgpack(self):
+        response = self.client.get('/api/tasks/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual('application/msgpack', response['Content-Type'])
+        self.assertEqual(self.client.get('/api/tasks/').json(), renderers.msgpack.unpackb(response.content))
+
+        category = Category.objects.create(name='category_name', owner=self.user)
+        priority = Priority.objects.create(name='priority_name', owner=self.user)
+        item = {'title': 'packed', 'category': category.pk, 'priority': priority.pk}
+        response = self.client.post('/api/tasks/', renderers.msgpack.packb(item), content_type='application/msgpack')
+        self.assertEqual(201, response.status_code)
+        self.assertTrue(Task.objects.filter(title='packed').exists())
+
+
+class CascadeDeleteTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.category = Category.objects.create(name='category_name', owner=self.user)
+        self.tasks = [TaskViewTest.create_task(owner=self.user) for _ in range(5)]
+        Task.objects.filter(pk__in=[task.pk for task in self.tasks[:4]]).update(category=self.category)
+        Task.objects.filter(pk=self.tasks[0].pk).update(deleted=True, deleted_at=timezone.now())
+
+    @override_settings(TASK_BULK_BATCH_SIZE=2)
+    def test_staff_delete_in_batches(self):
+        self.client.force_authenticate(user=TaskViewTest.create_user(username='admin', is_staff=True))
+        response = self.client.delete(f'/api/categories/{self.category.pk}/?dry_run=1')
+        self.assertEqual({'delete': 'hard', 'tasks': 4}, response.data)
+        self.assertEqual(5, Task.objects.count())
+
+        # число запросов зависит от числа пачек, а не от числа задач
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(f'/api/categories/{self.category.pk}/')
+        self.assertEqual(204, response.status_code)
+        self.assertEqual(3, len([query for query in context.captured_queries
+                                 if 'DELETE FROM "main_task"' in query['sql']]))
+        self.assertFalse(Category.objects.filter(pk=self.category.pk).exists())
+        self.assertEqual([self.tasks[4].pk], list(Task.objects.values_list('pk', flat=True)))
+
+    def test_soft_delete_marks_tasks(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.delete(f'/api/categories/{self.category.pk}/?dry_run=1')
+        self.assertEqual({'delete': 'soft', 'tasks': 3}, response.data)
+
+        self.assertEqual(204, self.client.delete(f'/api/categories/{self.category.pk}/').status_code)
+        self.assertEqual(4, Task.objects.filter(category=self.category, deleted=True, deleted_at__isnull=False).count())
+        self.assertFalse(Task.objects.get(pk=self.tasks[4].pk).deleted)
+        self.assertEqual([self.tasks[4].pk], [task['id'] for task in self.client.get('/api/tasks/').data['results']])
+
+
+class QueryPlanTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = TaskViewTest.create_user(username='username')
+        self.task = TaskViewTest.create_task(owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_task_endpoints_use_live_user_indexes(self):
+        # запросы пользователя к задачам идут по частичным индексам.
+        self.assertUsesIndex('/api/tasks/', 'main_task', 'task_live_user_idx')
+        self.assertUsesIndex('/api/tasks/status/Pending/', 'main_task', 'task_live_user_status_idx')
+        self.assertUsesIndex(f'/api/tasks/category/{self.task.category_id}/', 'main_task',
+                             'task_live_user_category_idx')
+        self.assertUsesIndex(f'/api/tasks/priority/{self.task.priority_id}/', 'main_task',
+                             'task_live_user_priority_idx')
+
+    def test_category_and_priority_lists_use_live_user_indexes(self):
+        self.assertUsesIndex('/api/categories/', 'main_category', 'category_live_user_idx')
+        self.assertUsesIndex('/api/priorities/', 'main_priority', 'priority_live_user_idx')
+
+    def assertUsesIndex(self, url, table, index_name):
+        # на маленьких таблицах планировщик выбирает seq scan, поэтому отключаем его.
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        sql = next(query['sql'] for query in context.captured_queries if f'FROM "{table}"' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}')
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn(index_name, plan)
@@ -0,0 +1,155 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from .models import Task
+
+
+# Ведро токенов хранится как одно число - время, когда ведро снова станет полным (алгоритм GCRA).
+# Каждый запрос сдвигает это время на period / rate; запрос отклоняется, если сдвиг уходит
+# дальше, чем на period вперед. Так ведро на rate токенов пополняется равномерно, без окон.
+def take_token(full_at, now, rate, period):
+    interval = period / rate
+    full_at = max(full_at or now, now) + interval
+    wait = full_at - period - now
+    return full_at, wait if wait > 0 else 0
+
+
+class LocalBackend:
+    # Без блокировок: чтение и запись одного ключа словаря атомарны под GIL. При одновременных
+    # запросах одного клиента токен иногда списывается один раз вместо двух - это допустимо.
+    def __init__(self):
+        self._buckets = {}
+
+    def acquire(self, key, rate, period):
+        now = time.monotonic()
+        full_at, wait = take_token(self._buckets.get(key), now, rate, period)
+        if not wait:
+            self._buckets[key] = full_at
+            if len(self._buckets) > settings.THROTTLE_LOCAL_MAX_KEYS:
+                self.prune(now)
+        return wait
+
+    async def aacquire(self, key, rate, period):
+        # только память процесса, цикл событий не блокируется
+        return self.acquire(key, rate, period)
+
+    def prune(self, now):
+        # полные ведра ничем не отличаются от отсутствующих
+        for key, full_at in list(self._buckets.items()):
+            if full_at <= now:
+                self._buckets.pop(key, None)
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class CacheBackend:
+    # Общее ведро для всех воркеров. Чтение и запись не атомарны, поэтому при гонке
+    # клиент может получить несколько лишних запросов сверх лимита.
+    def acquire(self, key, rate, period):
+        cache = caches[settings.THROTTLE_CACHE_ALIAS]
+        key = f'throttle:{key}'
+        now = time.time()
+        full_at, wait = take_token(cache.get(key), now, rate, period)
+        if not wait:
+            cache.set(key, full_at, timeout=math.ceil(full_at - now) + 1)
+        return wait
+
+    async def aacquire(self, key, rate, period):
+        # для асинхронных view: синхронный запрос к Redis остановил бы цикл событий
+        cache = caches[settings.THROTTLE_CACHE_ALIAS]
+        key = f'throttle:{key}'
+        now = time.time()
+        full_at, wait = take_token(await cache.aget(key), now, rate, period)
+        if not wait:
+            await cache.aset(key, full_at, timeout=math.ceil(full_at - now) + 1)
+        return wait
+
+
+BACKENDS = {
+    'local': LocalBackend(),
+    'cache': CacheBackend(),
+}
+
+
+def get_backend():
+    return BACKENDS[settings.THROTTLE_BACKEND]
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    def get_rate(self):
+        # ставки читаются при каждом запросе, чтобы их можно было менять через override_settings
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.retry_after = get_backend().acquire(self.key, self.num_requests, self.duration)
+        return not self.retry_after
+
+    async def aallow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.retry_after = await get_backend().aacquire(self.key, self.num_requests, self.duration)
+        return not self.retry_after
+
+    def wait(self):
+        return self.retry_after
+
+
+class UserThrottle(TokenBucketThrottle):
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return f'{self.scope}:{request.user.pk}'
+
+
+class IPThrottle(TokenBucketThrottle):
+    scope = 'ip'
+
+    def get_cache_key(self, request, view):
+        return f'{self.scope}:{self.get_ident(request)}'
+
+
+class AuthThrottle(IPThrottle):
+    scope = 'auth'
+
+
+class BulkThrottle(UserThrottle):
+    scope = 'bulk'
+
+
+class QuotaExceeded(PermissionDenied):
+    default_detail = _('Task quota exceeded.')
+    default_code = 'quota_exceeded'
+
+
+# Удаленные задачи тоже занимают место в таблице, пока их не перенесет archive_tasks.
+# Оба запроса проходят не больше quota строк индекса по owner, а не все задачи пользователя.
+def get_quota_left(user):
+    if user.is_staff or settings.TASK_QUOTA_PER_USER is None:
+        return None
+    quota = settings.TASK_QUOTA_PER_USER
+    return quota - Task.objects.filter(owner=user)[:quota].count()
+
+
+def has_quota(user):
+    if user.is_staff or settings.TASK_QUOTA_PER_USER is None:
+        return True
+    quota = settings.TASK_QUOTA_PER_USER
+    return quota > 0 and not Task.objects.filter(owner=user)[quota - 1:quota].exists()
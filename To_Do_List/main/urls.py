@@ -1,16 +1,26 @@
 from django.urls import path, include
 from rest_framework import routers
-from rest_framework.authtoken import views
 
-from .views import (TaskViewSet, CategoryViewSet, PriorityViewSet, UserViewSet)
+from . import async_views
+from .views import (TaskViewSet, CategoryViewSet, PriorityViewSet, JobViewSet, UserViewSet, SyncView, ObtainToken,
+                    ObtainSignedToken)
 
 router = routers.DefaultRouter()
 router.register('users', UserViewSet)
 router.register('tasks', TaskViewSet)
 router.register('categories', CategoryViewSet)
 router.register('priorities', PriorityViewSet)
+router.register('jobs', JobViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
-    path('api-token-auth/', views.obtain_auth_token),
+    path('api-token-auth/', ObtainToken.as_view()),
+    path('api-signed-token-auth/', ObtainSignedToken.as_view()),
+    path('sync/', SyncView.as_view()),
+    path('events/', async_views.event_stream),
+    path('async/tasks/', async_views.task_list),
+    path('async/tasks/<int:pk>/', async_views.task_detail),
+    path('async/tasks/status/<str:status>/', async_views.tasks_by_status),
+    path('async/tasks/category/<int:category>/', async_views.tasks_by_category),
+    path('async/tasks/priority/<int:priority>/', async_views.tasks_by_priority),
 ]
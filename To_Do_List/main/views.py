@@ -1,95 +1,166 @@
+from datetime import datetime, timedelta
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core import signing
+from django.db.models import Q
+from django.http import FileResponse, StreamingHttpResponse
 from rest_framework import viewsets
+from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework.permissions import IsAuthenticated
-
-from .serializers import TaskSerializer, CategorySerializer, PrioritySerializer, UserSerializer
-from .models import Task, Category, Priority
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from . import bulk, cache, cascade, export, jobs, routers, search, stats, throttling
+from .authentication import SignedTokenAuthentication
+from .conditional import conditional_get, object_response
+from .filters import TaskFilterBackend, TaskOrderingFilter
+from .serializers import (TaskSerializer, TaskListSerializer, TaskSearchSerializer, CategorySerializer,
+                          PrioritySerializer, JobSerializer, UserSerializer)
+from .models import Task, Category, Priority, Job, TaskArchive
+from .pagination import TaskCursorPagination
 from django.utils import timezone
 
 
+def job_accepted(request, job):
+    response = Response(JobSerializer(job).data, status=202)
+    response['Location'] = reverse('job-detail', args=[job.pk], request=request)
+    return response
+
+
+def is_dry_run(request):
+    return request.query_params.get('dry_run', '').lower() in ('1', 'true')
+
+
+def dry_run_response(request, instance):
+    # staff удаляет категорию вместе со всеми задачами, пользователь помечает удаленными свои живые задачи
+    counts = cascade.count_tasks(instance)
+    return Response({
+        'delete': 'hard' if request.user.is_staff else 'soft',
+        'tasks': counts['tasks'] if request.user.is_staff else counts['live_tasks'],
+    })
+
+
 class TaskViewSet(viewsets.ModelViewSet):
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TaskCursorPagination
+    filter_backends = [TaskFilterBackend, TaskOrderingFilter]
 
     @action(detail=False, methods=['GET'], url_path=r'status/(?P<status>\w+)')
+    @conditional_get
     def get_tasks_by_status(self, request, status=None):
         tasks_by_status = {
-            True: Task.objects.filter(status=status),
-            False: Task.objects.filter(status=status, deleted=False, created_by=request.user.username)
+            True: self.get_queryset().filter(status=status),
+            False: self.get_queryset().filter(status=status, deleted=False, owner=request.user)
         }[request.user.is_staff]
 
-        serializer = TaskSerializer(tasks_by_status, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(tasks_by_status)
 
     @action(detail=False, methods=['GET'], url_path=r'category/(?P<category>\d+)')
+    @conditional_get
     def get_tasks_by_category(self, request, category=None):
         tasks_by_category = {
-            True: Task.objects.filter(category=category),
-            False: Task.objects.filter(category=category, deleted=False, created_by=request.user.username)
+            True: self.get_queryset().filter(category=category),
+            False: self.get_queryset().filter(category=category, deleted=False, owner=request.user)
         }[request.user.is_staff]
 
-        serializer = TaskSerializer(tasks_by_category, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(tasks_by_category)
 
     @action(detail=False, methods=['GET'], url_path=r'priority/(?P<priority>\d+)')
+    @conditional_get
     def get_tasks_by_priority(self, request, priority=None):
         tasks_by_priority = {
-            True: Task.objects.filter(priority=priority),
-            False: Task.objects.filter(priority=priority, deleted=False, created_by=request.user.username)
+            True: self.get_queryset().filter(priority=priority),
+            False: self.get_queryset().filter(priority=priority, deleted=False, owner=request.user)
         }[request.user.is_staff]
 
-        serializer = TaskSerializer(tasks_by_priority, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(tasks_by_priority)
 
+    @conditional_get
     def list(self, request, *args, **kwargs):
-        if request.user.is_staff:
-            return super(TaskViewSet, self).list(request, *args, **kwargs)
+        user_tasks = {
+            True: self.get_queryset(),
+            False: self.get_queryset().filter(deleted=False, owner=request.user)
+        }[request.user.is_staff]
 
-        user_tasks = Task.objects.filter(deleted=False, created_by=request.user.username)
-        serializer = TaskSerializer(user_tasks, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(user_tasks)
+
+    def get_queryset(self):
+        queryset = super(TaskViewSet, self).get_queryset()
+        expanded = TaskSerializer.get_expanded_fields(self.request)
+        fields = TaskSerializer.get_requested_fields(self.request)
+        if fields:
+            queryset = queryset.only(*fields)
+        return queryset.select_related(*expanded) if expanded else queryset
+
+    def paginated_response(self, queryset):
+        key = cache.get_response_key(self.request)
+        data = cache.load(key)
+        if data is not None:
+            return Response(data)
+
+        queryset = self.filter_queryset(queryset)
+        fields = TaskSerializer.get_requested_fields(self.request)
+        ordering = [name.lstrip('-') for name in self.paginator.get_ordering(self.request, queryset, self)]
+        if TaskSerializer.get_expanded_fields(self.request):
+            if fields:
+                queryset = queryset.only(*fields, *ordering)
+            get_serializer = self.get_serializer
+        else:
+            # без ?expand= строки читаются через values() и сериализуются без моделей
+            queryset = queryset.values(*TaskListSerializer.get_columns(fields), *ordering)
+            get_serializer = partial(TaskListSerializer, fields=fields)
+
+        page = self.paginate_queryset(queryset)
+        serializer = get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        if not routers.uses_replica():
+            cache.store(key, response.data)
+        return response
 
     def retrieve(self, request, *args, **kwargs):
         if request.user.is_staff:
-            return super(TaskViewSet, self).retrieve(request, *args, **kwargs)
-
-        queryset = Task.objects.all()
-        task = get_object_or_404(queryset, pk=kwargs['pk'], created_by=request.user.username, deleted=False)
-        serializer = TaskSerializer(task)
-        return Response(serializer.data)
+            task = self.get_object()
+        else:
+            task = get_object_or_404(self.get_queryset(), pk=kwargs['pk'], owner=request.user, deleted=False)
+        return object_response(request, task, lambda: Response(self.get_serializer(task).data))
 
     def create(self, request, *args, **kwargs):
         if not request.user.is_staff:
-            username = request.user.username
             category_id = request.data.get('category')
             priority_id = request.data.get('priority')
-            get_object_or_404(Category.objects.all(), pk=category_id, created_by=username, deleted=False)
-            get_object_or_404(Priority.objects.all(), pk=priority_id, created_by=username, deleted=False)
+            get_object_or_404(Category.objects.all(), pk=category_id, owner=request.user, deleted=False)
+            get_object_or_404(Priority.objects.all(), pk=priority_id, owner=request.user, deleted=False)
+        if not throttling.has_quota(request.user):
+            raise throttling.QuotaExceeded()
 
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(created_by=request.user.username)
+        serializer.save(created_by=request.user.username, owner=request.user)
         return Response(serializer.data, status=201)
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
 
         if not request.user.is_staff:
-            username = request.user.username
             if instance.deleted:
                 return Response(status=404)
-            if instance.created_by != username:
+            if instance.owner_id != request.user.pk:
                 return Response(status=403)
             category_id = request.data.get('category')
             priority_id = request.data.get('priority')
             if category_id:
-                get_object_or_404(Category.objects.all(), pk=category_id, created_by=username, deleted=False)
+                get_object_or_404(Category.objects.all(), pk=category_id, owner=request.user, deleted=False)
             if priority_id:
-                get_object_or_404(Priority.objects.all(), pk=priority_id, created_by=username, deleted=False)
+                get_object_or_404(Priority.objects.all(), pk=priority_id, owner=request.user, deleted=False)
 
         serializer = self.get_serializer(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
@@ -101,48 +172,112 @@ class TaskViewSet(viewsets.ModelViewSet):
         if request.user.is_staff:
             instance.delete()
         elif not instance.deleted:
-            if instance.created_by != request.user.username:
+            if instance.owner_id != request.user.pk:
                 return Response(status=403)
             instance.deleted = True
             instance.deleted_at = timezone.now()
             instance.save()
         return Response(status=204)
 
+    @action(detail=False, methods=['POST', 'PATCH', 'DELETE'], url_path='bulk',
+            throttle_classes=[*api_settings.DEFAULT_THROTTLE_CLASSES, throttling.BulkThrottle])
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'detail': 'Expected a list of items.'}, status=400)
+        if len(items) > settings.TASK_BULK_MAX_ITEMS:
+            return Response({'detail': f'No more than {settings.TASK_BULK_MAX_ITEMS} items per request.'},
+                            status=400)
+
+        if jobs.is_background(request):
+            job = jobs.enqueue(request.user, 'bulk', {'method': request.method, 'items': items}, total=len(items))
+            return job_accepted(request, job)
+        return Response(bulk.HANDLERS[request.method](request.user, items))
+
+    @action(detail=False, methods=['GET'], url_path='export')
+    def export(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in export.FORMATS:
+            return Response({'output': f'Expected one of: {", ".join(export.FORMATS)}.'}, status=400)
+        if jobs.is_background(request):
+            return job_accepted(request, jobs.enqueue(request.user, 'export', {'output': output}))
+
+        tasks = {
+            True: Task.objects.all(),
+            False: Task.objects.filter(deleted=False, owner=request.user)
+        }[request.user.is_staff]
+
+        content, content_type = export.stream(tasks, output, settings.TASK_EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="tasks.{output}"'
+        return response
+
+    @action(detail=False, methods=['GET'], url_path='search')
+    @conditional_get
+    def search(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'q': 'This query parameter is required.'}, status=400)
+        limit = request.query_params.get('limit', str(settings.TASK_SEARCH_MAX_RESULTS))
+        if not limit.isdigit() or not 0 < int(limit) <= settings.TASK_SEARCH_MAX_RESULTS:
+            return Response({'limit': f'Expected a number from 1 to {settings.TASK_SEARCH_MAX_RESULTS}.'}, status=400)
+
+        user_tasks = {
+            True: self.get_queryset(),
+            False: self.get_queryset().filter(deleted=False, owner=request.user)
+        }[request.user.is_staff]
+
+        tasks = search.search(user_tasks, text, int(limit))
+        serializer = TaskSearchSerializer(tasks, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['GET'], url_path='stats')
+    @conditional_get
+    def stats(self, request):
+        days = request.query_params.get('days', '30')
+        if not days.isdigit() or not 0 < int(days) <= settings.TASK_STATS_MAX_DAYS:
+            return Response({'days': f'Expected a number from 1 to {settings.TASK_STATS_MAX_DAYS}.'}, status=400)
+        return Response(stats.get_stats(request, int(days)))
+
+    @action(detail=False, methods=['GET'], url_path='cache-stats')
+    def cache_stats(self, request):
+        if not request.user.is_staff:
+            return Response(status=403)
+        return Response(cache.stats.as_dict())
+
 
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.filter(deleted=False)
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
 
+    @conditional_get
     def list(self, request, *args, **kwargs):
         if request.user.is_staff:
             return super(CategoryViewSet, self).list(request, *args, **kwargs)
 
-        user_categories = Category.objects.filter(deleted=False, created_by=request.user.username)
+        user_categories = Category.objects.filter(deleted=False, owner=request.user)
         serializer = CategorySerializer(user_categories, many=True)
         return Response(serializer.data)
 
     def retrieve(self, request, *args, **kwargs):
         if request.user.is_staff:
-            return super(CategoryViewSet, self).retrieve(request, *args, **kwargs)
-
-        queryset = Category.objects.all()
-        task = get_object_or_404(queryset, pk=kwargs['pk'], created_by=request.user.username, deleted=False)
-        serializer = CategorySerializer(task)
-        return Response(serializer.data)
+            instance = self.get_object()
+        else:
+            instance = get_object_or_404(Category.objects.all(), pk=kwargs['pk'], owner=request.user, deleted=False)
+        return object_response(request, instance, lambda: Response(self.get_serializer(instance).data))
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(created_by=request.user.username)
+        serializer.save(created_by=request.user.username, owner=request.user)
         return Response(serializer.data, status=201)
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
 
         if not request.user.is_staff:
-            username = request.user.username
-            if instance.created_by != username:
+            if instance.owner_id != request.user.pk:
                 return Response(status=403)
 
         serializer = self.get_serializer(instance, data=request.data, partial=True)
@@ -152,14 +287,17 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
+        if not request.user.is_staff and not instance.deleted and instance.owner_id != request.user.pk:
+            return Response(status=403)
+        if is_dry_run(request):
+            return dry_run_response(request, instance)
+        if request.user.is_staff and jobs.is_background(request):
+            job = jobs.enqueue(request.user, 'destroy', {'model': 'category', 'id': instance.pk})
+            return job_accepted(request, job)
         if request.user.is_staff:
-            instance.delete()
+            cascade.delete(instance)
         elif not instance.deleted:
-            if instance.created_by != request.user.username:
-                return Response(status=403)
-            instance.deleted = True
-            instance.deleted_at = timezone.now()
-            instance.save()
+            cascade.soft_delete(instance)
         return Response(status=204)
 
 
@@ -168,35 +306,33 @@ class PriorityViewSet(viewsets.ModelViewSet):
     serializer_class = PrioritySerializer
     permission_classes = [IsAuthenticated]
 
+    @conditional_get
     def list(self, request, *args, **kwargs):
         if request.user.is_staff:
             return super(PriorityViewSet, self).list(request, *args, **kwargs)
 
-        user_priorities = Priority.objects.filter(deleted=False, created_by=request.user.username)
+        user_priorities = Priority.objects.filter(deleted=False, owner=request.user)
         serializer = PrioritySerializer(user_priorities, many=True)
         return Response(serializer.data)
 
     def retrieve(self, request, *args, **kwargs):
         if request.user.is_staff:
-            return super(PriorityViewSet, self).retrieve(request, *args, **kwargs)
-
-        queryset = Priority.objects.all()
-        task = get_object_or_404(queryset, pk=kwargs['pk'], created_by=request.user.username, deleted=False)
-        serializer = PrioritySerializer(task)
-        return Response(serializer.data)
+            instance = self.get_object()
+        else:
+            instance = get_object_or_404(Priority.objects.all(), pk=kwargs['pk'], owner=request.user, deleted=False)
+        return object_response(request, instance, lambda: Response(self.get_serializer(instance).data))
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(created_by=request.user.username)
+        serializer.save(created_by=request.user.username, owner=request.user)
         return Response(serializer.data, status=201)
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
 
         if not request.user.is_staff:
-            username = request.user.username
-            if instance.created_by != username:
+            if instance.owner_id != request.user.pk:
                 return Response(status=403)
 
         serializer = self.get_serializer(instance, data=request.data, partial=True)
@@ -206,17 +342,129 @@ class PriorityViewSet(viewsets.ModelViewSet):
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
+        if not request.user.is_staff and not instance.deleted and instance.owner_id != request.user.pk:
+            return Response(status=403)
+        if is_dry_run(request):
+            return dry_run_response(request, instance)
+        if request.user.is_staff and jobs.is_background(request):
+            job = jobs.enqueue(request.user, 'destroy', {'model': 'priority', 'id': instance.pk})
+            return job_accepted(request, job)
         if request.user.is_staff:
-            instance.delete()
+            cascade.delete(instance)
         elif not instance.deleted:
-            if instance.created_by != request.user.username:
-                return Response(status=403)
-            instance.deleted = True
-            instance.deleted_at = timezone.now()
-            instance.save()
+            cascade.soft_delete(instance)
         return Response(status=204)
 
 
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Job.objects.order_by('-created_at', '-id')
+        return queryset if self.request.user.is_staff else queryset.filter(owner=self.request.user)
+
+    @action(detail=True, methods=['GET'], url_path='download')
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if not job.file:
+            return Response(status=404)
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=f'tasks.{job.params["output"]}')
+
+
+class SyncView(APIView):
+    permission_classes = [IsAuthenticated]
+    models = (
+        ('tasks', Task, TaskSerializer),
+        ('categories', Category, CategorySerializer),
+        ('priorities', Priority, PrioritySerializer),
+        # задачи, которые archive_tasks перенес в архив (в том числе живые завершенные):
+        # отдаются только id, клиент удаляет их у себя
+        ('archived_tasks', TaskArchive, None),
+    )
+
+    def get(self, request):
+        # Страница отдает не больше TASK_SYNC_PAGE_SIZE строк каждой модели. Пока has_more, клиент
+        # запрашивает ?cursor=..., а token для следующей синхронизации приходит с последней страницей.
+        cursor = self.load_cursor(request.query_params.get('cursor'))
+        if cursor is None:
+            since = self.load_token(request.query_params.get('since'))
+            until = timezone.now() - timedelta(seconds=settings.TASK_SYNC_DELAY)
+            # при полной синхронизации архив не нужен: клиенту нечего удалять
+            after = {name: None for name, model, _ in self.models if since is not None or model is not TaskArchive}
+        else:
+            since, until, after = cursor
+
+        limit = settings.TASK_SYNC_PAGE_SIZE
+        data, next_after = {}, {}
+        for name, model, serializer_class in self.models:
+            if name not in after:
+                data[name] = []
+                continue
+            field = 'archived_at' if model is TaskArchive else 'updated_at'
+            queryset = model.objects.filter(**{f'{field}__lte': until})
+            if not request.user.is_staff:
+                queryset = queryset.filter(owner_id=request.user.pk)
+            if since is None:
+                queryset = queryset.filter(deleted=False)
+            else:
+                queryset = queryset.filter(**{f'{field}__gt': since})
+            if after[name] is not None:
+                value, pk = after[name]
+                queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+            rows = list(queryset.order_by(field, 'id')[:limit + 1])
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_after[name] = [getattr(rows[-1], field).isoformat(), rows[-1].pk]
+            data[name] = serializer_class(rows, many=True).data if serializer_class else [row.pk for row in rows]
+
+        data['has_more'] = bool(next_after)
+        data['cursor'] = signing.dumps([since and since.isoformat(), until.isoformat(), next_after],
+                                       salt='main.sync.cursor') if next_after else None
+        data['token'] = None if next_after else signing.dumps(until.isoformat(), salt='main.sync')
+        return Response(data)
+
+    @staticmethod
+    def load_cursor(token):
+        if not token:
+            return None
+        try:
+            since, until, after = signing.loads(
+                token, salt='main.sync.cursor', max_age=timedelta(days=settings.TASK_ARCHIVE_DELETED_DAYS))
+            since = since and datetime.fromisoformat(since)
+            after = {name: (datetime.fromisoformat(updated_at), pk) for name, (updated_at, pk) in after.items()}
+            return since, datetime.fromisoformat(until), after
+        except signing.SignatureExpired:
+            raise ValidationError({'cursor': 'Sync cursor expired, sync again without it.'})
+        except (signing.BadSignature, TypeError, ValueError, AttributeError):
+            raise ValidationError({'cursor': 'Invalid sync cursor.'})
+
+    @staticmethod
+    def load_token(token):
+        if not token:
+            return None
+        try:
+            return datetime.fromisoformat(signing.loads(
+                token, salt='main.sync', max_age=timedelta(days=settings.TASK_ARCHIVE_DELETED_DAYS)))
+        except signing.SignatureExpired:
+            raise ValidationError({'since': 'Sync token expired, sync again without it.'})
+        except (signing.BadSignature, TypeError, ValueError):
+            raise ValidationError({'since': 'Invalid sync token.'})
+
+
+class ObtainToken(ObtainAuthToken):
+    throttle_classes = [throttling.IPThrottle, throttling.AuthThrottle]
+
+
+class ObtainSignedToken(ObtainToken):
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        return Response({'token': SignedTokenAuthentication.create_token(user)})
+
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -0,0 +1,23 @@
+#!/bin/bash
+# Production entry point: migrations, static files and a multi-worker gunicorn.
+#   SERVER_MODE=asgi|wsgi   uvicorn workers (default) or threaded sync workers
+#   WEB_CONCURRENCY         worker processes, defaults to 2 * CPU cores + 1
+#   WEB_THREADS             threads per sync worker
+# Database settings are read by To_Do_List/settings_production.py.
+
+cd /usr/src/main/
+export PYTHONPATH=/usr/src/main/:$PYTHONPATH
+export DJANGO_SETTINGS_MODULE=To_Do_List.settings_production
+
+python manage.py migrate --noinput
+python manage.py collectstatic --noinput
+
+WORKERS=${WEB_CONCURRENCY:-$(( $(nproc) * 2 + 1 ))}
+
+if [ "${SERVER_MODE:-asgi}" = "wsgi" ]; then
+    exec gunicorn To_Do_List.wsgi:application --bind 0.0.0.0:8000 --workers "$WORKERS" \
+        --worker-class gthread --threads "${WEB_THREADS:-4}" --max-requests 10000 --max-requests-jitter 1000
+else
+    exec gunicorn To_Do_List.asgi:application --bind 0.0.0.0:8000 --workers "$WORKERS" \
+        --worker-class uvicorn.workers.UvicornWorker --max-requests 10000 --max-requests-jitter 1000
+fi